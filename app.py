@@ -24,6 +24,7 @@ from sensors.robust_sensor_manager import RobustSensorManager
 from utils.database import Database
 from controllers.scheduler import Scheduler  # Changed from utils.scheduler to controllers.scheduler
 from utils.debug_monitor import DebugMonitor
+from utils import fast_json
 
 # Set up logging
 logging.basicConfig(
@@ -80,7 +81,8 @@ socketio = SocketIO(
     always_connect=False,
     ping_timeout=60,
     ping_interval=25,
-    max_http_buffer_size=1000000
+    max_http_buffer_size=1000000,
+    json=fast_json  # orjson-backed encoder for emit payloads (stdlib fallback)
 )
 
 # Initialize database
@@ -339,7 +341,11 @@ def relay_control():
         # Try hardware control first
         if relay_controller and relay_controller.connected:
             try:
-                success = relay_controller.set_relay(channel, state)
+                # The pump state below is reported as applied, so wait for the device
+                if channel == WATER_PUMP_RELAY_CHANNEL:
+                    success = relay_controller.set_relay_sync(channel, state)
+                else:
+                    success = relay_controller.set_relay(channel, state)
                 if success:
                     logger.info(f"HARDWARE: Relay {channel} set to {'ON' if state else 'OFF'}")
                 else:
@@ -362,8 +368,7 @@ def relay_control():
             # Update light controller - channels 1-14 are for lights
             if 1 <= channel <= 14:
                 zone_id = ((channel - 1) // 2) + 1
-                if zone_id in light_controller.light_zones:
-                    light_controller.zone_states[zone_id] = state
+                light_controller.sync_zone_state(zone_id, state)
 
         status_msg = "HARDWARE" if (relay_controller and relay_controller.connected) else "SIMULATION"
         logger.info(f"{status_msg}: Relay {channel} -> {'ON' if state else 'OFF'}")
@@ -394,8 +399,8 @@ def relay_status(channel):
                 state = relay_controller.get_relay(channel)
             except:
                 # Fallback to cached state
-                if hasattr(relay_controller, '_relay_states') and 0 <= channel < len(relay_controller._relay_states):
-                    state = relay_controller._relay_states[channel]
+                if hasattr(relay_controller, 'get_relay_bit') and 0 <= channel < relay_controller.channels:
+                    state = relay_controller.get_relay_bit(channel)
         
         return jsonify({
             "status": "success",
@@ -811,7 +816,7 @@ def watering_control():
             
             if relay_controller and relay_controller.connected:
                 try:
-                    success = relay_controller.set_relay(WATER_PUMP_RELAY_CHANNEL, True)
+                    success = relay_controller.set_relay_sync(WATER_PUMP_RELAY_CHANNEL, True)
                     if success:
                         logger.info(f"HARDWARE: Water pump started for {duration} seconds")
                     else:
@@ -847,7 +852,7 @@ def watering_control():
             
             if relay_controller and relay_controller.connected:
                 try:
-                    success = relay_controller.set_relay(WATER_PUMP_RELAY_CHANNEL, False)
+                    success = relay_controller.set_relay_sync(WATER_PUMP_RELAY_CHANNEL, False)
                     if success:
                         logger.info("HARDWARE: Water pump stopped")
                 except Exception as e:
@@ -930,7 +935,7 @@ def manual_control():
                 success = False
                 if relay_controller and relay_controller.connected:
                     try:
-                        success = relay_controller.set_relay(WATER_PUMP_RELAY_CHANNEL, True)
+                        success = relay_controller.set_relay_sync(WATER_PUMP_RELAY_CHANNEL, True)
                     except Exception as e:
                         logger.error(f"Hardware water pump control error: {e}")
                 
@@ -948,7 +953,7 @@ def manual_control():
                 success = False
                 if relay_controller and relay_controller.connected:
                     try:
-                        success = relay_controller.set_relay(WATER_PUMP_RELAY_CHANNEL, False)
+                        success = relay_controller.set_relay_sync(WATER_PUMP_RELAY_CHANNEL, False)
                     except Exception as e:
                         logger.error(f"Hardware water pump stop error: {e}")
                 
@@ -1429,6 +1434,22 @@ if __name__ == '__main__':
         except Exception as stop_error:
             logger.error(f"Error stopping scheduler: {stop_error}")
         
+        try:
+            light_controller.stop()
+        except Exception as light_error:
+            logger.error(f"Error stopping light controller: {light_error}")
+        
+        try:
+            nutrient_controller.stop()
+        except Exception as nutrient_error:
+            logger.error(f"Error stopping nutrient controller: {nutrient_error}")
+        
+        try:
+            from utils.http_pool import http_pool
+            http_pool.shutdown()
+        except Exception as pool_error:
+            logger.error(f"Error shutting down HTTP pool: {pool_error}")
+        
         logger.info("Server shutdown complete")
         print("✅ Server shutdown complete")
 
@@ -2,14 +2,28 @@
 # CO2 environmental control system
 
 import time
+import uuid
 import logging
 import requests
 from requests.adapters import HTTPAdapter
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 
+from utils import fast_json
+from utils.http_pool import http_pool
+from controllers.ir_controller import VALID_MODES, VALID_FAN_SPEEDS
+
 logger = logging.getLogger(__name__)
 
+# AC settings driven through IR: attr -> (validator, allowed description, IRController method,
+# deduped: skip the IR send and emit when unchanged unless force=True)
+# Temperature is always passed to the IR controller, which steps from its own tracked value.
+_AC_ATTRS = {
+    'temperature': (lambda t: 16 <= t <= 30, 'between 16-30°C', 'set_ac_temperature', False),
+    'mode': (lambda m: m in VALID_MODES, f"one of: {sorted(VALID_MODES)}", 'set_ac_mode', True),
+    'fan_speed': (lambda f: f in VALID_FAN_SPEEDS, f"one of: {sorted(VALID_FAN_SPEEDS)}", 'set_ac_fan_speed', True),
+}
+
 class EnvironmentController:
     def __init__(self, db, socketio, sensor_manager=None, relay_controller=None, light_controller=None, ir_controller=None):
         self.db = db
@@ -23,6 +37,8 @@ class EnvironmentController:
         self.co2_arduino_ip = '192.168.1.107'  # Same as main sensor Arduino
         self.co2_arduino_port = 80              # Same as main sensor Arduino
         self.co2_channels = [1, 2]              # Channels 1&2 for CO2 valve
+        # Ask the Arduino for the CO2 channels only (firmware without filter support returns all relays)
+        self._co2_filter_qs = '?channels=' + ','.join(map(str, self.co2_channels))
         self.co2_state = False                  # Current CO2 injector state
         
         # CO2 control settings with day/night targets
@@ -37,6 +53,10 @@ class EnvironmentController:
         self._last_co2_update = 0
         self._co2_update_interval = 0.03  # 30ms for ultra-fast response speed
         
+        # Background jobs (CO2 test / forced update) keyed by job id
+        self._bg_jobs = {}
+        self._max_bg_jobs = 20
+        
         # Air Conditioner on relay channel 15 + IR control (Airfel only)
         self.air_conditioner_channel = 15
         self.air_conditioner_state = False
@@ -190,30 +210,8 @@ class EnvironmentController:
                 current_hour = datetime.now().hour
                 return self.co2_day_start <= current_hour < self.co2_day_end
             
-            # Get current time
-            current_time = datetime.now().time()
-            
-            # Check all enabled schedules
-            for schedule in self.light_controller.schedules:
-                if not schedule.get('enabled', True):
-                    continue
-                
-                # Parse schedule times
-                start_time = datetime.strptime(schedule['start_time'], '%H:%M').time()
-                end_time = datetime.strptime(schedule['end_time'], '%H:%M').time()
-                
-                # Check if current time is within schedule
-                if start_time <= end_time:
-                    # Normal schedule (e.g., 06:00 to 22:00)
-                    if start_time <= current_time <= end_time:
-                        return True
-                else:
-                    # Schedule crosses midnight (e.g., 22:00 to 06:00)
-                    if current_time >= start_time or current_time <= end_time:
-                        return True
-            
-            # No active schedules found, lights should be off
-            return False
+            # Same schedule evaluation (pre-parsed times) the light controller uses
+            return self.light_controller.are_lights_on()
             
         except Exception as e:
             logger.error(f"Error determining light period: {e}")
@@ -243,7 +241,7 @@ class EnvironmentController:
         elif device_id in self.fan_mapping:
             channel = self.fan_mapping[device_id]
             if self.relay_controller:
-                success = self.relay_controller.set_relay(channel, state)
+                success = self.relay_controller.set_relay_sync(channel, state)
                 if success:
                     self.fan_states[device_id] = state
                     logger.info(f"🌀 FAN MANUAL CONTROL: {device_id} (Ch.{channel}) set to {'ON' if state else 'OFF'}")
@@ -346,7 +344,7 @@ class EnvironmentController:
             if mode == 'off':
                 # Turn off all fans
                 for fan_name, channel in self.fan_mapping.items():
-                    if self.relay_controller.set_relay(channel, False):
+                    if self.relay_controller.set_relay_sync(channel, False):
                         self.fan_states[fan_name] = False
                         success_count += 1
                         logger.info(f"🌀 Fan {fan_name} (Ch.{channel}) turned OFF")
@@ -356,7 +354,7 @@ class EnvironmentController:
             elif mode == 'continuous':
                 # Turn on all fans
                 for fan_name, channel in self.fan_mapping.items():
-                    if self.relay_controller.set_relay(channel, True):
+                    if self.relay_controller.set_relay_sync(channel, True):
                         self.fan_states[fan_name] = True
                         success_count += 1
                         logger.info(f"🌀 Fan {fan_name} (Ch.{channel}) turned ON")
@@ -367,7 +365,7 @@ class EnvironmentController:
                 # For intermittent mode, turn on all fans now
                 # The actual intermittent timing would be handled by a background task
                 for fan_name, channel in self.fan_mapping.items():
-                    if self.relay_controller.set_relay(channel, True):
+                    if self.relay_controller.set_relay_sync(channel, True):
                         self.fan_states[fan_name] = True
                         success_count += 1
                         logger.info(f"🌀 Fan {fan_name} (Ch.{channel}) turned ON (intermittent mode)")
@@ -544,7 +542,7 @@ class EnvironmentController:
                 
                 # Strategy 1: Ultra-simple request with longer timeout
                 try:
-                    response = requests.get(url, timeout=0.5, headers={
+                    response = http_pool.get_sync(url, timeout=0.5, headers={
                         'Connection': 'close',
                         'Cache-Control': 'no-cache',
                         'User-Agent': 'CO2Controller/1.0'
@@ -563,16 +561,13 @@ class EnvironmentController:
                 if not channel_success:
                     time.sleep(0.2)  # Wait for Arduino to recover - faster response
                     
-                    # Strategy 2: Fresh session with conservative settings
-                    session = requests.Session()
-                    session.headers.update({
-                        'Connection': 'close', 
-                        'Cache-Control': 'no-cache',
-                        'Accept': '*/*'
-                    })
-                    
+                    # Strategy 2: Conservative settings with a longer timeout
                     try:
-                        response = session.get(url, timeout=1.0)
+                        response = http_pool.get_sync(url, timeout=1.0, headers={
+                            'Connection': 'close',
+                            'Cache-Control': 'no-cache',
+                            'Accept': '*/*'
+                        })
                         if response.status_code == 200:
                             logger.info(f"🌱 ✅ CO2 channel {channel} -> {command_state.upper()} (strategy 2)")
                             successful_channels += 1
@@ -583,11 +578,6 @@ class EnvironmentController:
                         logger.error(f"❌ CO2 channel {channel} -> TIMEOUT on strategy 2 (2.0s)")
                     except Exception as e:
                         logger.error(f"❌ CO2 channel {channel} -> ERROR on strategy 2: {e}")
-                    finally:
-                        try:
-                            session.close()
-                        except:
-                            pass
                 
                 # If both strategies failed, try one final attempt with maximum patience
                 if not channel_success:
@@ -595,7 +585,7 @@ class EnvironmentController:
                     
                     try:
                         # Strategy 3: Maximum patience approach
-                        response = requests.get(url, timeout=1.5, headers={'Connection': 'close'})
+                        response = http_pool.get_sync(url, timeout=1.5, headers={'Connection': 'close'})
                         if response.status_code == 200:
                             logger.info(f"🌱 ✅ CO2 channel {channel} -> {command_state.upper()} (strategy 3 - patient)")
                             successful_channels += 1
@@ -627,161 +617,87 @@ class EnvironmentController:
     def set_ac_power(self, power_on: bool) -> bool:
         """Control air conditioner power via relay + IR"""
         try:
-            success = True
-            
             # First, control the main power relay (channel 15)
             if self.relay_controller:
-                relay_success = self.relay_controller.set_relay(self.air_conditioner_channel, power_on)
-                if relay_success:
+                if self.relay_controller.set_relay_sync(self.air_conditioner_channel, power_on):
                     self.air_conditioner_state = power_on
                     logger.info(f"AC RELAY: Power {'ON' if power_on else 'OFF'} (Channel {self.air_conditioner_channel})")
                 else:
-                    success = False
                     logger.error(f"AC RELAY: Failed to control power relay")
+                    return False
             
-            # Then, send IR command for advanced control
-            if self.ac_ir_enabled and self.ir_controller and success:
-                ir_success = self.ir_controller.set_ac_power(power_on)
-                if ir_success:
-                    self.ac_settings['power'] = power_on
+            # Then, send IR command for advanced control (IR failure is not fatal)
+            if self.ac_ir_enabled and self.ir_controller:
+                if self.ir_controller.set_ac_power(power_on):
                     logger.info(f"AC IR: Power {'ON' if power_on else 'OFF'} via IR")
                 else:
                     logger.warning(f"AC IR: Failed to send power command via IR")
-                    # Don't fail the whole operation if only IR fails
-            
-            # Update settings and emit socket event
-            if success:
-                self.ac_settings['power'] = power_on
-                try:
-                    self.socketio.emit('ac_state_change', {
-                        'power': power_on,
-                        'temperature': self.ac_settings['temperature'],
-                        'mode': self.ac_settings['mode'],
-                        'fan_speed': self.ac_settings['fan_speed'],
-                        'timestamp': datetime.now().isoformat()
-                    })
-                except Exception as socket_error:
-                    logger.warning(f"Socket emit error (ac_state_change): {socket_error}")
             
-            return success
+            self.ac_settings['power'] = power_on
+            self._emit_ac_state()
+            return True
             
         except Exception as e:
             logger.error(f"Error controlling AC power: {e}")
             return False
     
     def set_ac_temperature(self, temperature: int) -> bool:
-        """Set air conditioner temperature via IR"""
-        if not 16 <= temperature <= 30:
-            logger.error(f"Invalid AC temperature {temperature}. Must be between 16-30°C")
-            return False
-        
-        try:
-            # Only use IR for temperature control
-            if self.ac_ir_enabled and self.ir_controller:
-                success = self.ir_controller.set_ac_temperature(temperature)
-                if success:
-                    self.ac_settings['temperature'] = temperature
-                    logger.info(f"AC IR: Temperature set to {temperature}°C")
-                    
-                    # Emit socket event
-                    try:
-                        self.socketio.emit('ac_state_change', {
-                            'power': self.ac_settings['power'],
-                            'temperature': temperature,
-                            'mode': self.ac_settings['mode'],
-                            'fan_speed': self.ac_settings['fan_speed'],
-                            'timestamp': datetime.now().isoformat()
-                        })
-                    except Exception as socket_error:
-                        logger.warning(f"Socket emit error (ac_temp_change): {socket_error}")
-                    
-                    return True
-                else:
-                    logger.error(f"AC IR: Failed to set temperature to {temperature}°C")
-                    return False
-            else:
-                logger.warning("AC IR: IR controller not available for temperature control")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error setting AC temperature: {e}")
-            return False
+        """Set air conditioner temperature via IR (always sent)"""
+        return self._set_ac_attr('temperature', temperature)
+    
+    def set_ac_mode(self, mode: str, force: bool = False) -> bool:
+        """Set air conditioner mode via IR (no-op if already in that mode unless force=True)"""
+        return self._set_ac_attr('mode', mode, force)
     
-    def set_ac_mode(self, mode: str) -> bool:
-        """Set air conditioner mode via IR"""
-        valid_modes = ['cool', 'heat', 'fan', 'auto', 'dry']
-        if mode not in valid_modes:
-            logger.error(f"Invalid AC mode {mode}. Must be one of: {valid_modes}")
+    def set_ac_fan_speed(self, speed: str, force: bool = False) -> bool:
+        """Set air conditioner fan speed via IR (no-op if already at that speed unless force=True)"""
+        return self._set_ac_attr('fan_speed', speed, force)
+    
+    def _set_ac_attr(self, attr, value, force=False):
+        """Validate, dedupe (mode/fan speed only), send via IR and broadcast a single AC setting"""
+        validator, allowed, ir_method, deduped = _AC_ATTRS[attr]
+        label = attr.replace('_', ' ')
+        
+        if not validator(value):
+            logger.error(f"Invalid AC {label} {value}. Must be {allowed}")
             return False
         
         try:
-            if self.ac_ir_enabled and self.ir_controller:
-                success = self.ir_controller.set_ac_mode(mode)
-                if success:
-                    self.ac_settings['mode'] = mode
-                    logger.info(f"AC IR: Mode set to {mode}")
-                    
-                    # Emit socket event
-                    try:
-                        self.socketio.emit('ac_state_change', {
-                            'power': self.ac_settings['power'],
-                            'temperature': self.ac_settings['temperature'],
-                            'mode': mode,
-                            'fan_speed': self.ac_settings['fan_speed'],
-                            'timestamp': datetime.now().isoformat()
-                        })
-                    except Exception as socket_error:
-                        logger.warning(f"Socket emit error (ac_mode_change): {socket_error}")
-                    
-                    return True
-                else:
-                    logger.error(f"AC IR: Failed to set mode to {mode}")
-                    return False
-            else:
-                logger.warning("AC IR: IR controller not available for mode control")
+            if not (self.ac_ir_enabled and self.ir_controller):
+                logger.warning(f"AC IR: IR controller not available for {label} control")
                 return False
-                
+            
+            if deduped and not force and self.ac_settings[attr] == value:
+                logger.debug(f"AC IR: {label.capitalize()} already {value}, skipping command and emit")
+                return True
+            
+            ir_setter = getattr(self.ir_controller, ir_method)
+            success = ir_setter(value, force=force) if deduped else ir_setter(value)
+            if not success:
+                logger.error(f"AC IR: Failed to set {label} to {value}")
+                return False
+            
+            self.ac_settings[attr] = value
+            logger.info(f"AC IR: {label.capitalize()} set to {value}")
+            self._emit_ac_state()
+            return True
+            
         except Exception as e:
-            logger.error(f"Error setting AC mode: {e}")
+            logger.error(f"Error setting AC {label}: {e}")
             return False
     
-    def set_ac_fan_speed(self, speed: str) -> bool:
-        """Set air conditioner fan speed via IR"""
-        valid_speeds = ['low', 'medium', 'high', 'auto']
-        if speed not in valid_speeds:
-            logger.error(f"Invalid AC fan speed {speed}. Must be one of: {valid_speeds}")
-            return False
-        
+    def _emit_ac_state(self):
+        """Broadcast the current AC settings as an 'ac_state_change' event"""
         try:
-            if self.ac_ir_enabled and self.ir_controller:
-                success = self.ir_controller.set_ac_fan_speed(speed)
-                if success:
-                    self.ac_settings['fan_speed'] = speed
-                    logger.info(f"AC IR: Fan speed set to {speed}")
-                    
-                    # Emit socket event
-                    try:
-                        self.socketio.emit('ac_state_change', {
-                            'power': self.ac_settings['power'],
-                            'temperature': self.ac_settings['temperature'],
-                            'mode': self.ac_settings['mode'],
-                            'fan_speed': speed,
-                            'timestamp': datetime.now().isoformat()
-                        })
-                    except Exception as socket_error:
-                        logger.warning(f"Socket emit error (ac_fan_change): {socket_error}")
-                    
-                    return True
-                else:
-                    logger.error(f"AC IR: Failed to set fan speed to {speed}")
-                    return False
-            else:
-                logger.warning("AC IR: IR controller not available for fan speed control")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error setting AC fan speed: {e}")
-            return False
+            self.socketio.emit('ac_state_change', {
+                'power': self.ac_settings['power'],
+                'temperature': self.ac_settings['temperature'],
+                'mode': self.ac_settings['mode'],
+                'fan_speed': self.ac_settings['fan_speed'],
+                'timestamp': datetime.now().isoformat()
+            })
+        except Exception as socket_error:
+            logger.warning(f"Socket emit error (ac_state_change): {socket_error}")
     
     def get_ac_status(self) -> Dict[str, Any]:
         """Get current air conditioner status"""
@@ -803,20 +719,20 @@ class EnvironmentController:
     def get_co2_relay_status(self):
         """Get current CO2 relay status from main Arduino - robust Arduino-friendly approach"""
         try:
-            url = f"http://{self.co2_arduino_ip}:{self.co2_arduino_port}/api/relay"
+            url = f"http://{self.co2_arduino_ip}:{self.co2_arduino_port}/api/relay{self._co2_filter_qs}"
             
             logger.debug(f"🌱 Checking CO2 relay status: {url}")
             
             # Strategy 1: Quick check with conservative timeout
             try:
-                response = requests.get(url, timeout=0.8, headers={
+                response = http_pool.get_sync(url, timeout=0.8, headers={
                     'Connection': 'close',
                     'Cache-Control': 'no-cache',
                     'Accept': 'application/json'
                 })
                 
                 if response.status_code == 200:
-                    data = response.json()
+                    data = fast_json.loads(response.content)
                     relays = data.get('relays', [])
                     
                     logger.debug(f"🌱 Arduino returned {len(relays)} relays")
@@ -847,6 +763,8 @@ class EnvironmentController:
                 logger.debug(f"🌱 Arduino status check timeout (1.5s) - Arduino may be processing commands")
             except requests.exceptions.ConnectionError:
                 logger.debug(f"🌱 Arduino status check connection error")
+            except fast_json.JSONDecodeError as e:
+                logger.debug(f"🌱 Arduino status check returned invalid JSON: {e}")
             except Exception as e:
                 logger.debug(f"🌱 Arduino status check error: {e}")
             
@@ -868,8 +786,20 @@ class EnvironmentController:
                 'error': str(e)
             }
     
-    def test_co2_system(self):
-        """Test CO2 system integration with main Arduino"""
+    def test_co2_system(self, async_=True):
+        """Test CO2 system integration with main Arduino
+        
+        By default the test runs as a socketio background task: a job descriptor
+        is returned immediately and the results are emitted as 'co2_test_result'.
+        Pass async_=False to run inline and get the results dict directly.
+        """
+        if async_ and self.socketio:
+            return self._start_bg_job('co2_test', self._run_co2_test, self.socketio.sleep,
+                                      result_event='co2_test_result')
+        return self._run_co2_test(time.sleep)
+    
+    def _run_co2_test(self, sleep):
+        """Run the CO2 on/off test sequence using the given sleep function"""
         logger.info("🌱 Testing CO2 system integration with main Arduino...")
         
         try:
@@ -881,7 +811,7 @@ class EnvironmentController:
             logger.info("🌱 Testing CO2 ON...")
             success_on = self._send_co2_command(True)
             if success_on:
-                time.sleep(0.5)  # Wait for relay to respond - faster verification
+                sleep(0.5)  # Wait for relay to respond - faster verification
                 status_on = self.get_co2_relay_status()
                 logger.info(f"🌱 CO2 ON status: {status_on}")
             
@@ -889,7 +819,7 @@ class EnvironmentController:
             logger.info("🌱 Testing CO2 OFF...")
             success_off = self._send_co2_command(False)
             if success_off:
-                time.sleep(0.5)  # Wait for relay to respond - faster verification
+                sleep(0.5)  # Wait for relay to respond - faster verification
                 status_off = self.get_co2_relay_status()
                 logger.info(f"🌱 CO2 OFF status: {status_off}")
             
@@ -914,7 +844,7 @@ class EnvironmentController:
             logger.error(f"🌱 ❌ CO2 system test FAILED: {e}")
             return {'error': str(e), 'test_passed': False}
     
-    def force_co2_update(self, sensor_data=None):
+    def force_co2_update(self, sensor_data=None, async_=True):
         """Force CO2 update by resetting throttling - for testing purposes"""
         logger.info("🌱 FORCING CO2 UPDATE - Resetting throttling")
         self._last_co2_update = 0  # Reset throttling
@@ -928,31 +858,63 @@ class EnvironmentController:
             }
             logger.info(f"🌱 Using test sensor data: {sensor_data}")
         
+        if async_ and self.socketio:
+            return self._start_bg_job('co2_force_update', self._control_co2_injector, sensor_data)
         self._control_co2_injector(sensor_data)
     
-    def ultra_fast_co2_control(self, target_state=None, reason="manual"):
-        """Ultra-fast CO2 control for immediate response"""
+    def _start_bg_job(self, job_type, func, *args, result_event=None):
+        """Run func(*args) as a socketio background task and return its job descriptor"""
+        job_id = uuid.uuid4().hex
+        
+        # Drop the oldest entries so the registry stays bounded
+        while len(self._bg_jobs) >= self._max_bg_jobs:
+            self._bg_jobs.pop(next(iter(self._bg_jobs)))
+        
+        self._bg_jobs[job_id] = {'type': job_type, 'status': 'running', 'started': time.time()}
+        self.socketio.start_background_task(self._run_bg_job, job_id, func, args, result_event)
+        logger.info(f"Started background job {job_type} ({job_id})")
+        return {'job_id': job_id, 'status': 'running'}
+    
+    def _run_bg_job(self, job_id, func, args, result_event):
+        """Background task body: execute, record the result and optionally emit it"""
+        try:
+            result = func(*args)
+            status = 'done'
+        except Exception as e:
+            logger.error(f"Background job {job_id} failed: {e}")
+            result = {'error': str(e)}
+            status = 'failed'
+        
+        job = self._bg_jobs.get(job_id)
+        if job is not None:
+            job.update(status=status, result=result, finished=time.time())
+        
+        if result_event:
+            try:
+                self.socketio.emit(result_event, {'job_id': job_id, 'status': status, 'result': result})
+            except Exception as socket_error:
+                logger.warning(f"Socket emit error ({result_event}): {socket_error}")
+    
+    def get_bg_job(self, job_id):
+        """Get status/result of a background job started by test_co2_system/force_co2_update"""
+        job = self._bg_jobs.get(job_id)
+        return dict(job) if job is not None else None
+    
+    def ultra_fast_co2_control(self, target_state=None, reason="manual", wait=True):
+        """Ultra-fast CO2 control for immediate response
+
+        With wait=False and an explicit target_state, the Arduino command runs
+        on the shared HTTP pool and a Future resolving to the success flag is
+        returned immediately.
+        """
         logger.info(f"🚨 ULTRA FAST CO2 CONTROL: {reason}")
         
         try:
             if target_state is not None:
                 # Direct state control
-                success = self._send_co2_command(target_state)
-                if success:
-                    self.co2_state = target_state
-                    self._last_co2_update = time.time()
-                    logger.info(f"🚨 ✅ ULTRA FAST CO2: Injector set to {'ON' if target_state else 'OFF'}")
-                    
-                    # Emit immediate status update
-                    if self.socketio:
-                        self.socketio.emit('co2_status', {
-                            'state': target_state,
-                            'current_ppm': 0,  # Unknown in fast mode
-                            'target_ppm': 0,   # Unknown in fast mode
-                            'cycle': 'ultra_fast',
-                            'emergency': True
-                        })
-                return success
+                if not wait:
+                    return http_pool.submit(self._apply_ultra_fast_co2_state, target_state)
+                return self._apply_ultra_fast_co2_state(target_state)
             else:
                 # Force immediate sensor-based update
                 self._last_co2_update = 0  # Reset throttling
@@ -975,4 +937,23 @@ class EnvironmentController:
                 
         except Exception as e:
             logger.error(f"❌ ULTRA FAST CO2 CONTROL ERROR: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def _apply_ultra_fast_co2_state(self, target_state):
+        """Send the CO2 command and broadcast the new state on success"""
+        success = self._send_co2_command(target_state)
+        if success:
+            self.co2_state = target_state
+            self._last_co2_update = time.time()
+            logger.info(f"🚨 ✅ ULTRA FAST CO2: Injector set to {'ON' if target_state else 'OFF'}")
+            
+            # Emit immediate status update
+            if self.socketio:
+                self.socketio.emit('co2_status', {
+                    'state': target_state,
+                    'current_ppm': 0,  # Unknown in fast mode
+                    'target_ppm': 0,   # Unknown in fast mode
+                    'cycle': 'ultra_fast',
+                    'emergency': True
+                })
+        return success
@@ -6,8 +6,14 @@ import json
 import time
 from typing import Dict, Optional, Any
 
+from utils import fast_json
+from utils.http_pool import http_pool
+
 logger = logging.getLogger(__name__)
 
+VALID_MODES = frozenset(('cool', 'heat', 'fan', 'auto', 'dry'))
+VALID_FAN_SPEEDS = frozenset(('low', 'medium', 'high', 'auto'))
+
 class IRController:
     """Controller for IR devices via ESP32 transmitter"""
     
@@ -47,9 +53,15 @@ class IRController:
             'timer': 'AIRFEL_AC_TIMER',
             'sleep': 'AIRFEL_AC_SLEEP'
         }
+        self._build_command_lookups()
         
         logger.info(f"IR Controller initialized for ESP32 at {self.base_url}")
     
+    def _build_command_lookups(self):
+        """Materialize mode/fan setter lookups keyed by external name"""
+        self._mode_commands = {m: self.airfel_commands.get(f'mode_{m}') for m in VALID_MODES}
+        self._fan_commands = {f: self.airfel_commands.get(f'fan_{f}') for f in VALID_FAN_SPEEDS}
+    
     def connect(self) -> bool:
         """Test connection to ESP32 IR transmitter"""
         try:
@@ -83,7 +95,7 @@ class IRController:
                 "timestamp": int(time.time())
             }
             
-            response = requests.post(
+            response = http_pool.post_sync(
                 f"{self.base_url}/ir/send",
                 json=payload,
                 timeout=self.timeout,
@@ -91,7 +103,7 @@ class IRController:
             )
             
             if response.status_code == 200:
-                result = response.json()
+                result = fast_json.loads(response.content)
                 if result.get('status') == 'success':
                     logger.info(f"IR command sent successfully: {command}")
                     return True
@@ -102,6 +114,9 @@ class IRController:
                 logger.error(f"Failed to send IR command: HTTP {response.status_code}")
                 return False
                 
+        except fast_json.JSONDecodeError as e:
+            logger.error(f"Invalid JSON reply from ESP32 for IR command {command}: {e}")
+            return False
         except Exception as e:
             logger.error(f"Error sending IR command {command}: {e}")
             self.connected = False
@@ -162,14 +177,23 @@ class IRController:
         
         return success
     
-    def set_ac_mode(self, mode: str) -> bool:
-        """Set air conditioner mode (Airfel)"""
-        valid_modes = ['cool', 'heat', 'fan', 'auto', 'dry']
-        if mode not in valid_modes:
-            logger.error(f"Invalid mode {mode}. Must be one of: {valid_modes}")
+    def set_ac_mode(self, mode: str, force: bool = False) -> bool:
+        """Set air conditioner mode (Airfel)
+
+        Mode commands are absolute, so the IR send is skipped when the tracked
+        state already matches. Pass force=True to re-send anyway (e.g. the AC
+        missed the previous IR burst).
+        """
+        if mode not in VALID_MODES:
+            logger.error(f"Invalid mode {mode}. Must be one of: {sorted(VALID_MODES)}")
             return False
         
-        command = self.airfel_commands.get(f'mode_{mode}')
+        if not force and self.ac_state['mode'] == mode:
+            self.ac_state['last_update'] = time.time()
+            logger.debug(f"Airfel AC mode already {mode}, skipping IR command")
+            return True
+        
+        command = self._mode_commands[mode]
         
         if not command:
             logger.error(f"No {mode} mode command found for Airfel AC")
@@ -183,14 +207,21 @@ class IRController:
         
         return success
     
-    def set_ac_fan_speed(self, speed: str) -> bool:
-        """Set air conditioner fan speed (Airfel)"""
-        valid_speeds = ['low', 'medium', 'high', 'auto']
-        if speed not in valid_speeds:
-            logger.error(f"Invalid fan speed {speed}. Must be one of: {valid_speeds}")
+    def set_ac_fan_speed(self, speed: str, force: bool = False) -> bool:
+        """Set air conditioner fan speed (Airfel)
+
+        Skipped when the tracked fan speed already matches unless force=True.
+        """
+        if speed not in VALID_FAN_SPEEDS:
+            logger.error(f"Invalid fan speed {speed}. Must be one of: {sorted(VALID_FAN_SPEEDS)}")
             return False
         
-        command = self.airfel_commands.get(f'fan_{speed}')
+        if not force and self.ac_state['fan_speed'] == speed:
+            self.ac_state['last_update'] = time.time()
+            logger.debug(f"Airfel AC fan speed already {speed}, skipping IR command")
+            return True
+        
+        command = self._fan_commands[speed]
         
         if not command:
             logger.error(f"No {speed} fan speed command found for Airfel AC")
@@ -211,6 +242,7 @@ class IRController:
     def add_custom_airfel_command(self, command_name: str, ir_code: str):
         """Add custom IR command for Airfel AC"""
         self.airfel_commands[command_name] = ir_code
+        self._build_command_lookups()
         logger.info(f"Added custom Airfel command {command_name}: {ir_code}")
     
     def get_connection_status(self) -> Dict[str, Any]:
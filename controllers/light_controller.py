@@ -3,10 +3,22 @@
 import time
 import datetime
 import logging
-import json
+import queue
+import threading
+
+from utils import fast_json
 
 logger = logging.getLogger(__name__)
 
+_ONE_DAY = datetime.timedelta(days=1)
+# Schedules include their end minute (current_time <= end_time), so lights go off just after it
+_END_BOUNDARY_OFFSET = datetime.timedelta(seconds=1)
+
+def _parse_hhmm(value):
+    """Parse an 'HH:MM' schedule time into a datetime.time (cheaper than strptime)"""
+    hours, minutes = value.split(':')
+    return datetime.time(int(hours), int(minutes))
+
 class LightController:
     def __init__(self, db, socketio, relay_controller=None):
         self.db = db
@@ -14,6 +26,12 @@ class LightController:
         self.relay_controller = relay_controller
         self.simulation_mode = not relay_controller
         
+        # Hardware availability is fixed at construction; only relay_controller.connected
+        # changes at runtime, so resolve the relay write methods once
+        self._use_hw = not self.simulation_mode and bool(relay_controller)
+        self._relay_set = relay_controller.set_relay if self._use_hw else None
+        self._relay_set_many = getattr(relay_controller, 'set_relays', None) if self._use_hw else None
+        
         # Basic light zone configuration (Zone ID -> Relay Channels)
         self.light_zones = {
             1: {'relay_a': 1, 'relay_b': 2},   # Zone 1 uses relays 1,2
@@ -28,14 +46,54 @@ class LightController:
         # Add compatibility attribute for app.py
         self.lights = self.light_zones  # Alias for backward compatibility
         
-        # Track current states
-        self.zone_states = {zone_id: False for zone_id in self.light_zones.keys()}
+        # Track current states as a bitmask: bit (zone_id - 1) set means the zone is ON
+        self._state_mask = 0
+        self._all_zones_mask = (1 << len(self.light_zones)) - 1
+        
+        # Relay topology is fixed, so resolve it once: (relay_a, relay_b) indexed by zone_id - 1
+        self._zone_relay_pairs = tuple(
+            (zone['relay_a'], zone['relay_b']) for _, zone in sorted(self.light_zones.items())
+        )
+        self._all_relays = tuple(relay for pair in self._zone_relay_pairs for relay in pair)
+
+        # Relay writes for the all-ON / all-OFF transitions, fixed by the zone topology
+        self._bulk_relay_states = {
+            True: dict.fromkeys(self._all_relays, True),
+            False: dict.fromkeys(self._all_relays, False)
+        }
+        
+        # Bulk transitions emit one 'light_state_changes' event; set True to also emit
+        # the per-zone 'light_state_change' events for older clients
+        self.emit_legacy_light_events = False
+        
+        # Next schedule boundary (epoch seconds) and the target state last applied by update()
+        self._next_transition_ts = 0
+        self._schedule_target = None
+        
+        # Serializes update(), manual and bulk control: the transition timer, the scheduler
+        # and web requests can all change the zone bitmask and schedule target at once
+        self._state_lock = threading.RLock()
+        
+        # One-shot timer that applies the schedule exactly at the next boundary. Polling
+        # through update() stays on as a safety net unless periodic_checks_enabled is cleared
+        self._transition_timer = None
+        self._transition_timer_lock = threading.Lock()
+        self.periodic_checks_enabled = True
+        
+        # Parsed result of get_all_light_schedules(); dropped whenever schedules are edited
+        self._all_schedules_cache = None
+        self._schedules_version = 0
+        
+        # Socket.IO emits run on a worker thread so slow clients never stall relay control
+        self._emit_q = queue.Queue()
+        self._emit_thread = threading.Thread(target=self._emit_worker, name='light_emit', daemon=True)
+        self._emit_thread.start()
         
         # Load schedules from database
         self.schedules = self._load_schedules_from_db()
         
-        # Last check time to prevent too frequent updates
-        self.last_check = 0
+        # Last update() run; polled updates closer together than check_interval are skipped
+        self._last_update_time = 0.0
         self.check_interval = 30  # Check every 30 seconds (reduced from 60 for better responsiveness)
         
         logger.info(f"Light controller initialized - {'Simulation' if self.simulation_mode else 'Hardware'} mode")
@@ -43,6 +101,167 @@ class LightController:
         # Initialize all zones to a consistent state
         self._initialize_all_zones()
 
+    @property
+    def zone_states(self):
+        """Read-only {zone_id: state} view of the zone bitmask"""
+        mask = self._state_mask
+        return {zone_id: bool(mask >> (zone_id - 1) & 1) for zone_id in self.light_zones}
+
+    def _zone_is_on(self, zone_id):
+        return bool(self._state_mask >> (zone_id - 1) & 1)
+
+    def _set_zone_bit(self, zone_id, state):
+        bit = 1 << (zone_id - 1)
+        if state:
+            self._state_mask |= bit
+        else:
+            self._state_mask &= ~bit
+
+    def sync_zone_state(self, zone_id, state):
+        """Record a zone state changed outside the controller (e.g. direct relay control)"""
+        with self._state_lock:
+            if zone_id in self.light_zones:
+                self._set_zone_bit(zone_id, state)
+
+    @property
+    def schedules(self):
+        return self._schedules
+
+    @schedules.setter
+    def schedules(self, schedules):
+        """Replace the schedule list and rebuild the parsed start/end time cache"""
+        self._schedules = schedules
+        self._rebuild_schedule_cache()
+
+    def invalidate_schedules_cache(self):
+        """Drop the memoized get_all_light_schedules() result after a schedule edit"""
+        self._schedules_version += 1
+        self._all_schedules_cache = None
+
+    def _rebuild_schedule_cache(self):
+        """Pre-parse enabled schedule times once so the per-tick checks avoid strptime"""
+        self.invalidate_schedules_cache()  # Every edit path reassigns self.schedules
+        enabled_schedules = []
+        for schedule in self._schedules or []:
+            if not schedule.get('enabled', True):
+                continue
+            try:
+                start_time = _parse_hhmm(schedule['start_time'])
+                end_time = _parse_hhmm(schedule['end_time'])
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Skipping light schedule {schedule.get('id')} with invalid times: {e}")
+                continue
+            enabled_schedules.append((schedule, start_time, end_time))
+        self._enabled_schedules_cache = enabled_schedules
+        self._next_transition_ts = 0  # Force a full re-evaluation on the next update()
+        self._schedule_next_transition_timer()
+
+    def _schedule_next_transition_timer(self):
+        """(Re)arm the one-shot timer for the next start/end boundary of the enabled schedules"""
+        next_ts = self._compute_next_transition_ts()
+        with self._transition_timer_lock:
+            if self._transition_timer is not None:
+                self._transition_timer.cancel()
+                self._transition_timer = None
+            if next_ts == float('inf'):
+                return  # No enabled schedules - nothing to wake up for
+            
+            timer = threading.Timer(max(0.0, next_ts - time.time()), self._on_transition)
+            timer.daemon = True
+            timer.start()
+            self._transition_timer = timer
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Next light transition timer set for {datetime.datetime.fromtimestamp(next_ts).isoformat()}")
+
+    def _on_transition(self):
+        """Timer callback: apply the schedule at the boundary, then arm the next timer"""
+        try:
+            self.update(force_check=True)
+        finally:
+            self._schedule_next_transition_timer()
+
+    def stop(self):
+        """Cancel the pending transition timer and stop the emit worker (called on shutdown)"""
+        with self._transition_timer_lock:
+            if self._transition_timer is not None:
+                self._transition_timer.cancel()
+                self._transition_timer = None
+        self._emit_q.put_nowait(None)
+
+    def _queue_emit(self, event_name, payload):
+        """Hand a socket event to the emit worker"""
+        self._emit_q.put_nowait((event_name, payload))
+
+    def _emit_worker(self):
+        """Emit queued socket events, coalescing bursts of per-zone events (last wins)"""
+        while True:
+            batch = [self._emit_q.get()]
+            try:
+                while True:
+                    batch.append(self._emit_q.get_nowait())
+            except queue.Empty:
+                pass
+            
+            stopping = None in batch
+            if stopping:
+                batch = batch[:batch.index(None)]
+            
+            # Only the newest 'light_state_change' per zone in this burst is worth sending
+            latest = {}
+            for i, (event_name, payload) in enumerate(batch):
+                if event_name == 'light_state_change':
+                    latest[payload['zone_id']] = i
+            
+            for i, (event_name, payload) in enumerate(batch):
+                if event_name == 'light_state_change' and latest[payload['zone_id']] != i:
+                    continue
+                try:
+                    self.socketio.emit(event_name, payload)
+                except Exception as socket_error:
+                    logger.warning(f"Socket emit error: {socket_error}")
+            
+            if stopping:
+                return
+
+    def _find_active_schedule(self, current_time=None):
+        """Return the first enabled schedule covering current_time, or None"""
+        if current_time is None:
+            current_time = datetime.datetime.now().time()
+        
+        for schedule, start_time, end_time in self._enabled_schedules_cache:
+            # Handle schedules that cross midnight
+            if start_time <= end_time:
+                # Normal schedule (e.g., 06:00 to 22:00)
+                if start_time <= current_time <= end_time:
+                    return schedule
+            else:
+                # Schedule crosses midnight (e.g., 22:00 to 06:00)
+                if current_time >= start_time or current_time <= end_time:
+                    return schedule
+        
+        return None
+
+    def _compute_next_transition_ts(self, now_dt=None):
+        """Epoch time of the next start/end boundary across enabled schedules (inf if none)"""
+        if now_dt is None:
+            now_dt = datetime.datetime.now()
+        today = now_dt.date()
+        
+        next_ts = float('inf')
+        for _, start_time, end_time in self._enabled_schedules_cache:
+            for boundary in (datetime.datetime.combine(today, start_time),
+                             datetime.datetime.combine(today, end_time) + _END_BOUNDARY_OFFSET):
+                if boundary <= now_dt:
+                    boundary += _ONE_DAY
+                next_ts = min(next_ts, boundary.timestamp())
+        
+        return next_ts
+
+    def _compute_lights_should_be_on(self, current_time=None):
+        """Check whether any enabled schedule is active at current_time (default: now)"""
+        return self._find_active_schedule(current_time) is not None
+
     def _load_schedules_from_db(self):
         """Load schedules from database"""
         try:
@@ -77,38 +296,46 @@ class LightController:
         
         return default
 
-    def _set_light_state(self, light_id, state):
-        """Set the physical state of a light using the relay controller"""
+    def _set_light_state(self, light_id, state, pending_events=None, timestamp=None):
+        """Set the physical state of a light using the relay controller
+        
+        When pending_events is a list the socket event is appended to it instead
+        of being emitted, so bulk callers can send a single batched event.
+        timestamp (ISO string) lets callers reuse one clock reading for a batch.
+        """
         try:
             # Check if zone exists
             if light_id not in self.light_zones:
                 logger.warning(f"Unknown light zone ID: {light_id}")
                 return False
             
-            # Get current state and check if change is needed
-            current_state = self.zone_states.get(light_id, False)
+            # Get current state and check if change is needed (one shift + AND on the mask)
+            bit = 1 << (light_id - 1)
+            current_state = bool(self._state_mask & bit)
             if current_state == state:
                 logger.debug(f"Light zone {light_id} already in desired state: {state}")
                 return True
             
-            # Get zone configuration
-            zone_config = self.light_zones[light_id]
-            relay_a = zone_config['relay_a']
-            relay_b = zone_config['relay_b']
+            # Get zone relays
+            relay_a, relay_b = self._zone_relay_pairs[light_id - 1]
             
-            logger.info(f"Changing Light Zone {light_id}: {'OFF' if current_state else 'ON'} -> {'ON' if state else 'OFF'} (relays {relay_a}, {relay_b})")
+            log_info = logger.isEnabledFor(logging.INFO)
+            if log_info:
+                logger.info(f"Changing Light Zone {light_id}: {'OFF' if current_state else 'ON'} -> {'ON' if state else 'OFF'} (relays {relay_a}, {relay_b})")
             
             success = True
             
-            if not self.simulation_mode and self.relay_controller and self.relay_controller.connected:
+            if self._use_hw and self.relay_controller.connected:
                 # Control physical relays
                 try:
-                    success_a = self.relay_controller.set_relay(relay_a, state)
-                    success_b = self.relay_controller.set_relay(relay_b, state)
+                    relay_set = self._relay_set
+                    success_a = relay_set(relay_a, state)
+                    success_b = relay_set(relay_b, state)
                     success = success_a and success_b
                     
                     if success:
-                        logger.info(f"HARDWARE: Light Zone {light_id} relays {relay_a},{relay_b} set to {'ON' if state else 'OFF'}")
+                        if log_info:
+                            logger.info(f"HARDWARE: Light Zone {light_id} relays {relay_a},{relay_b} set to {'ON' if state else 'OFF'}")
                     else:
                         logger.error(f"HARDWARE: Failed to set Light Zone {light_id} relays {relay_a},{relay_b}")
                         
@@ -117,23 +344,27 @@ class LightController:
                     success = False
             else:
                 # Simulation mode
-                logger.info(f"SIMULATION: Light Zone {light_id} set to {'ON' if state else 'OFF'}")
+                if log_info:
+                    logger.info(f"SIMULATION: Light Zone {light_id} set to {'ON' if state else 'OFF'}")
                 success = True
             
             if success:
                 # Update internal state
-                self.zone_states[light_id] = state
+                self._state_mask = (self._state_mask | bit) if state else (self._state_mask & ~bit)
                 
-                # Emit socket event for frontend updates
-                try:
-                    self.socketio.emit('light_state_change', {
-                        'light_id': light_id,
-                        'zone_id': light_id,  # Add zone_id for compatibility
-                        'state': state,
-                        'timestamp': datetime.datetime.now().isoformat()
-                    })
-                except Exception as socket_error:
-                    logger.warning(f"Socket emit error: {socket_error}")
+                # A fresh dict per event: payloads sit in pending_events / the emit queue
+                # until the worker sends them, so a reused template would be overwritten
+                event = {
+                    'light_id': light_id,
+                    'zone_id': light_id,  # Add zone_id for compatibility
+                    'state': state,
+                    'timestamp': timestamp or datetime.datetime.now().isoformat()
+                }
+                if pending_events is not None:
+                    pending_events.append(event)
+                else:
+                    # Emit socket event for frontend updates
+                    self._queue_emit('light_state_change', event)
             
             return success
                 
@@ -143,119 +374,227 @@ class LightController:
 
     def update(self, sensor_data=None, force_check=False):
         """Update light schedules and control lights based on current time"""
-        try:
-            # Add throttling to prevent excessive updates
-            now = time.time()
-            if not force_check and hasattr(self, '_last_update_time'):
-                time_since_last = now - self._last_update_time
-                if time_since_last < 30:  # Minimum 30 seconds between updates
-                    return
-            
-            self._last_update_time = now
-            
-            current_time = datetime.datetime.now().time()
-            logger.info(f"Light schedule check at {current_time.strftime('%H:%M:%S')}")
-            
-            # Check if any schedule is active
-            lights_should_be_on = False
-            active_schedule = None
-            
-            for schedule in self.schedules:
-                if not schedule.get('enabled', True):
-                    continue
+        with self._state_lock:
+            try:
+                now = time.time()
+                if not force_check:
+                    # Boundaries are handled by the transition timer; polling is only a safety net
+                    if not self.periodic_checks_enabled:
+                        return
+                    
+                    # Throttle polled updates
+                    if now - self._last_update_time < self.check_interval:
+                        return
+                    
+                    # Nothing can change before the next schedule boundary while all zones match the last target
+                    if (now < self._next_transition_ts and
+                            self._state_mask == (self._all_zones_mask if self._schedule_target else 0)):
+                        return
                 
-                start_time = datetime.datetime.strptime(schedule['start_time'], '%H:%M').time()
-                end_time = datetime.datetime.strptime(schedule['end_time'], '%H:%M').time()
+                self._last_update_time = now
                 
-                # Handle schedules that cross midnight
-                if start_time <= end_time:
-                    # Normal schedule (e.g., 06:00 to 22:00)
-                    if start_time <= current_time <= end_time:
-                        lights_should_be_on = True
-                        active_schedule = schedule
-                        break
-                else:
-                    # Schedule crosses midnight (e.g., 22:00 to 06:00)
-                    if current_time >= start_time or current_time <= end_time:
-                        lights_should_be_on = True
-                        active_schedule = schedule
-                        break
-            
-            # Log the schedule decision
-            if lights_should_be_on and active_schedule:
-                logger.info(f"Lights should be ON - Active schedule: {active_schedule['start_time']}-{active_schedule['end_time']}")
-            elif lights_should_be_on:
-                logger.info(f"Lights should be ON - Schedule active")
-            else:
-                logger.info(f"Lights should be OFF - No active schedules at {current_time.strftime('%H:%M')}")
-            
-            # Check if ANY zone needs state change
-            zones_needing_change = []
-            for zone_id in self.light_zones.keys():
-                current_state = self.zone_states.get(zone_id, False)
-                if current_state != lights_should_be_on:
-                    zones_needing_change.append(zone_id)
-            
-            # If any zones need changing, update ALL zones to ensure synchronization
-            if zones_needing_change:
-                logger.info(f"Updating ALL light zones to {'ON' if lights_should_be_on else 'OFF'}")
-                logger.info(f"Zones that needed change: {zones_needing_change}")
+                # One clock reading for the whole tick (schedule check, event timestamps, next boundary)
+                now_dt = datetime.datetime.fromtimestamp(now)
+                now_iso = now_dt.isoformat()
+                current_time = now_dt.time()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Light schedule check at {current_time.strftime('%H:%M:%S')}")
                 
-                # Update all zones to the same state
-                success_count = 0
-                failed_zones = []
+                # Check if any schedule is active
+                active_schedule = self._find_active_schedule(current_time)
+                lights_should_be_on = active_schedule is not None
                 
-                for zone_id in self.light_zones.keys():
-                    try:
-                        if self._set_light_state(zone_id, lights_should_be_on):
-                            success_count += 1
-                        else:
-                            failed_zones.append(zone_id)
-                    except Exception as e:
-                        logger.error(f"Error updating zone {zone_id}: {e}")
-                        failed_zones.append(zone_id)
+                # Set bits of diff are the out-of-sync zones; diff == 0 means nothing to do
+                diff = self._state_mask ^ (self._all_zones_mask if lights_should_be_on else 0)
+                zones_needing_change = []
+                while diff:
+                    zones_needing_change.append((diff & -diff).bit_length())
+                    diff &= diff - 1
                 
-                # Log results
-                total_zones = len(self.light_zones)
-                if success_count == total_zones:
-                    logger.info(f"✅ Successfully updated all {total_zones} light zones to {'ON' if lights_should_be_on else 'OFF'}")
-                else:
-                    logger.warning(f"⚠️ Light zone update partial success: {success_count}/{total_zones} successful")
-                    if failed_zones:
-                        logger.warning(f"Failed zones: {failed_zones}")
-            else:
-                logger.debug(f"All light zones already in correct state: {'ON' if lights_should_be_on else 'OFF'}")
+                # Log the schedule decision (INFO only when it leads to a change)
+                decision_level = logging.INFO if zones_needing_change else logging.DEBUG
+                if logger.isEnabledFor(decision_level):
+                    if active_schedule:
+                        logger.log(decision_level, f"Lights should be ON - Active schedule: {active_schedule['start_time']}-{active_schedule['end_time']}")
+                    else:
+                        logger.log(decision_level, f"Lights should be OFF - No active schedules at {current_time.strftime('%H:%M')}")
+                
+                # Bring the out-of-sync zones to the common target so all zones end up synchronized
+                if zones_needing_change:
+                    logger.info(f"Updating ALL light zones to {'ON' if lights_should_be_on else 'OFF'}")
+                    logger.info(f"Zones that needed change: {zones_needing_change}")
                     
-        except Exception as e:
-            logger.error(f"Error in light controller update: {e}")
+                    if len(zones_needing_change) == len(self.light_zones):
+                        # Schedule boundary: every zone flips the same way
+                        ok = self._bulk_transition(lights_should_be_on, timestamp=now_iso)
+                        failed_zones = [] if ok else zones_needing_change
+                    else:
+                        events = []
+                        failed_zones = self._set_zones_state(zones_needing_change, lights_should_be_on,
+                                                             pending_events=events, timestamp=now_iso)
+                        self._emit_light_state_changes(events)
+                    
+                    # Log results
+                    total_zones = len(self.light_zones)
+                    success_count = total_zones - len(failed_zones)
+                    if success_count == total_zones:
+                        logger.info(f"✅ Successfully updated all {total_zones} light zones to {'ON' if lights_should_be_on else 'OFF'}")
+                    else:
+                        logger.warning(f"⚠️ Light zone update partial success: {success_count}/{total_zones} successful")
+                        if failed_zones:
+                            logger.warning(f"Failed zones: {failed_zones}")
+                else:
+                    logger.debug(f"All light zones already in correct state: {'ON' if lights_should_be_on else 'OFF'}")
+                
+                self._schedule_target = lights_should_be_on
+                self._next_transition_ts = self._compute_next_transition_ts(now_dt)
+                        
+            except Exception as e:
+                logger.error(f"Error in light controller update: {e}")
 
     def manual_control(self, zone_id, state):
         """Manual control of a zone"""
-        try:
-            success = self._set_light_state(zone_id, state)
-            if success:
-                logger.info(f"Manual control: Zone {zone_id} set to {'ON' if state else 'OFF'}")
-            return success
-        except Exception as e:
-            logger.error(f"Error in manual control: {e}")
-            return False
+        with self._state_lock:
+            try:
+                success = self._set_light_state(zone_id, state)
+                if success:
+                    logger.info(f"Manual control: Zone {zone_id} set to {'ON' if state else 'OFF'}")
+                return success
+            except Exception as e:
+                logger.error(f"Error in manual control: {e}")
+                return False
 
     def control_all_zones(self, state):
         """Control all zones at once"""
+        with self._state_lock:
+            try:
+                success = self._bulk_transition(state)
+                logger.info(f"Controlled all zones to {'ON' if state else 'OFF'}: {'successful' if success else 'failed'}")
+                return success
+            except Exception as e:
+                logger.error(f"Error controlling all zones: {e}")
+                return False
+
+    def _get_bulk_relay_writer(self):
+        """Return relay_controller.set_relays when usable for hardware writes, else None"""
+        if self._use_hw and self.relay_controller.connected:
+            return self._relay_set_many
+        return None
+
+    def _bulk_transition(self, target_state, timestamp=None):
+        """Switch every zone to target_state with one relay write and one socket event"""
+        set_relays = self._get_bulk_relay_writer()
+        if set_relays is None:
+            events = []
+            failed_zones = self._set_zones_state(self.light_zones.keys(), target_state,
+                                                 pending_events=events, timestamp=timestamp)
+            self._emit_light_state_changes(events)
+            return not failed_zones
+        
         try:
-            success_count = 0
-            for zone_id in self.light_zones.keys():
-                if self._set_light_state(zone_id, state):
-                    success_count += 1
-            
-            logger.info(f"Controlled all zones: {success_count}/{len(self.light_zones)} successful")
-            return success_count == len(self.light_zones)
+            success = set_relays(self._bulk_relay_states[target_state])
         except Exception as e:
-            logger.error(f"Error controlling all zones: {e}")
+            logger.error(f"Hardware error switching all light zones: {e}")
+            success = False
+        
+        if not success:
+            logger.error(f"HARDWARE: Failed to switch all light zones {'ON' if target_state else 'OFF'}")
             return False
+        
+        new_mask = self._all_zones_mask if target_state else 0
+        changed = self._state_mask ^ new_mask
+        self._state_mask = new_mask
+        logger.info(f"HARDWARE: All light zones set to {'ON' if target_state else 'OFF'}")
+        
+        if changed:
+            if timestamp is None:
+                timestamp = datetime.datetime.now().isoformat()
+            events = []
+            while changed:
+                zone_id = (changed & -changed).bit_length()
+                events.append({'light_id': zone_id, 'zone_id': zone_id, 'state': target_state, 'timestamp': timestamp})
+                changed &= changed - 1
+            self._emit_light_state_changes(events)
+        return True
+
+    def _set_zones_state(self, zone_ids, state, pending_events=None, force=False, timestamp=None):
+        """Switch several zones with a single bulk relay write; returns the zone IDs that failed
+        
+        Zones already in the requested state are skipped unless force=True. Falls back to
+        per-zone writes in simulation mode or when the relay controller has no set_relays().
+        """
+        zone_ids = [zone_id for zone_id in zone_ids
+                    if force or self._zone_is_on(zone_id) != state]
+        if not zone_ids:
+            return []
+        if timestamp is None:
+            timestamp = datetime.datetime.now().isoformat()
+        
+        set_relays = self._get_bulk_relay_writer()
+        if set_relays is None:
+            failed_zones = []
+            # Both per-zone setters catch and log their own errors and return False
+            for zone_id in zone_ids:
+                if force:
+                    ok = self._set_light_state_force(zone_id, state)
+                    if ok:
+                        self._set_zone_bit(zone_id, state)
+                else:
+                    ok = self._set_light_state(zone_id, state, pending_events=pending_events, timestamp=timestamp)
+                if not ok:
+                    failed_zones.append(zone_id)
+            return failed_zones
+        
+        relay_states = {}
+        relay_pairs = self._zone_relay_pairs
+        for zone_id in zone_ids:
+            relay_a, relay_b = relay_pairs[zone_id - 1]
+            relay_states[relay_a] = state
+            relay_states[relay_b] = state
+        
+        try:
+            success = set_relays(relay_states)
+        except Exception as e:
+            logger.error(f"Hardware error in bulk light update for zones {zone_ids}: {e}")
+            success = False
+        
+        if not success:
+            logger.error(f"HARDWARE: Failed bulk write of relays {sorted(relay_states)} for zones {zone_ids}")
+            return zone_ids
+        
+        logger.info(f"HARDWARE: Light zones {zone_ids} set to {'ON' if state else 'OFF'} (relays {sorted(relay_states)})")
+        for zone_id in zone_ids:
+            self._set_zone_bit(zone_id, state)
+            if pending_events is not None:
+                pending_events.append({
+                    'light_id': zone_id,
+                    'zone_id': zone_id,
+                    'state': state,
+                    'timestamp': timestamp
+                })
+        return []
+
+    def _emit_light_state_changes(self, events):
+        """Send the zone changes collected during a bulk transition as one socket event"""
+        if not events:
+            return
+        
+        self._queue_emit('light_state_changes', {
+            'changes': events,
+            'timestamp': events[-1]['timestamp']
+        })
+        if self.emit_legacy_light_events:
+            for event in events:
+                self._queue_emit('light_state_change', event)
 
     def get_all_light_schedules(self):
-        """Get all light schedules including disabled ones"""
+        """Get all light schedules including disabled ones (memoized until the next edit;
+        the returned list is shared, so callers must not mutate it)"""
+        cached = self._all_schedules_cache
+        if cached is not None:
+            return cached
+        
+        version = self._schedules_version
         try:
             conn = self.db.get_connection()
             cursor = conn.cursor()
@@ -269,8 +608,8 @@ class LightController:
                 affected_zones = []
                 if row['affected_zones']:
                     try:
-                        affected_zones = json.loads(row['affected_zones'])
-                    except json.JSONDecodeError:
+                        affected_zones = fast_json.loads(row['affected_zones'])
+                    except fast_json.JSONDecodeError:
                         logger.warning(f"Invalid JSON in affected_zones for schedule {row['id']}")
                         affected_zones = []
                 
@@ -283,6 +622,9 @@ class LightController:
                     'affected_zones': affected_zones
                 })
             
+            # Don't cache a result that an edit made stale while we were reading
+            if version == self._schedules_version:
+                self._all_schedules_cache = schedules
             return schedules
         except Exception as e:
             logger.error(f"Error retrieving all light schedules: {e}")
@@ -303,33 +645,12 @@ class LightController:
     def are_lights_on(self):
         """Determine if lights should be on based on current time and schedules"""
         try:
-            current_time = datetime.datetime.now().time()
-            
-            # Check if any schedule is active
-            for schedule in self.schedules:
-                if not schedule.get('enabled', True):
-                    continue
-                
-                start_time = datetime.datetime.strptime(schedule['start_time'], '%H:%M').time()
-                end_time = datetime.datetime.strptime(schedule['end_time'], '%H:%M').time()
-                
-                # Handle schedules that cross midnight
-                if start_time <= end_time:
-                    # Normal schedule (e.g., 06:00 to 22:00)
-                    if start_time <= current_time <= end_time:
-                        return True
-                else:
-                    # Schedule crosses midnight (e.g., 22:00 to 06:00)
-                    if current_time >= start_time or current_time <= end_time:
-                        return True
-            
-            # No active schedules found, lights should be off
-            return False
+            return self._compute_lights_should_be_on()
             
         except Exception as e:
             logger.error(f"Error determining light status: {e}")
             # Fallback to checking if any zones are on
-            return any(self.zone_states.values())
+            return self._state_mask != 0
 
     def _initialize_all_zones(self):
         """Initialize all light zones to OFF state at startup"""
@@ -338,40 +659,15 @@ class LightController:
             
             # Determine what state lights should be in based on current time
             current_time = datetime.datetime.now().time()
-            lights_should_be_on = False
-            
-            for schedule in self.schedules:
-                if not schedule.get('enabled', True):
-                    continue
-                
-                start_time = datetime.datetime.strptime(schedule['start_time'], '%H:%M').time()
-                end_time = datetime.datetime.strptime(schedule['end_time'], '%H:%M').time()
-                
-                # Handle schedules that cross midnight
-                if start_time <= end_time:
-                    # Normal schedule (e.g., 06:00 to 22:00)
-                    if start_time <= current_time <= end_time:
-                        lights_should_be_on = True
-                        break
-                else:
-                    # Schedule crosses midnight (e.g., 22:00 to 06:00)
-                    if current_time >= start_time or current_time <= end_time:
-                        lights_should_be_on = True
-                        break
+            lights_should_be_on = self._compute_lights_should_be_on(current_time)
             
             # Set all zones to the correct initial state
             initial_state = lights_should_be_on
             logger.info(f"Setting all zones to initial state: {'ON' if initial_state else 'OFF'} based on time {current_time.strftime('%H:%M')}")
             
-            success_count = 0
-            for zone_id in self.light_zones.keys():
-                try:
-                    # Force set the state regardless of current state tracking
-                    if self._set_light_state_force(zone_id, initial_state):
-                        success_count += 1
-                        self.zone_states[zone_id] = initial_state
-                except Exception as e:
-                    logger.error(f"Error initializing zone {zone_id}: {e}")
+            # Force set the state regardless of current state tracking
+            failed_zones = self._set_zones_state(self.light_zones.keys(), initial_state, force=True)
+            success_count = len(self.light_zones) - len(failed_zones)
             
             logger.info(f"Zone initialization complete: {success_count}/{len(self.light_zones)} zones set to {'ON' if initial_state else 'OFF'}")
             
@@ -386,20 +682,19 @@ class LightController:
                 logger.warning(f"Unknown light zone ID: {light_id}")
                 return False
             
-            # Get zone configuration
-            zone_config = self.light_zones[light_id]
-            relay_a = zone_config['relay_a']
-            relay_b = zone_config['relay_b']
+            # Get zone relays
+            relay_a, relay_b = self._zone_relay_pairs[light_id - 1]
             
             logger.info(f"Force setting Light Zone {light_id} to {'ON' if state else 'OFF'} (relays {relay_a}, {relay_b})")
             
             success = True
             
-            if not self.simulation_mode and self.relay_controller and self.relay_controller.connected:
+            if self._use_hw and self.relay_controller.connected:
                 # Control physical relays
                 try:
-                    success_a = self.relay_controller.set_relay(relay_a, state)
-                    success_b = self.relay_controller.set_relay(relay_b, state)
+                    relay_set = self._relay_set
+                    success_a = relay_set(relay_a, state)
+                    success_b = relay_set(relay_b, state)
                     success = success_a and success_b
                     
                     if success:
@@ -3,12 +3,15 @@ Modbus Relay Controller - Implementation for Waveshare Modbus POE ETH Relay 30CH
 https://www.waveshare.com/wiki/Modbus_POE_ETH_Relay_30CH
 """
 
+import sys
 import time
+import array
 import logging
-import datetime
+import queue
+import selectors
 import socket
+import struct
 import threading
-import traceback
 from typing import Dict, List, Any, Optional
 
 logger = logging.getLogger(__name__)
@@ -23,6 +26,36 @@ except ImportError:
     logger.warning("pymodbus not installed - install with: pip install pymodbus")
     MODBUS_AVAILABLE = False
 
+# Optional C implementation of CRC16/Modbus; only used when crcmod's compiled extension is present
+try:
+    import crcmod.predefined
+    import crcmod._crcfunext  # noqa: F401 - pure-Python crcmod is no faster than the table below
+    _crc16_modbus = crcmod.predefined.mkPredefinedCrcFun('modbus')
+    CRCMOD_AVAILABLE = True
+except ImportError:
+    _crc16_modbus = None
+    CRCMOD_AVAILABLE = False
+
+
+def _build_crc_table():
+    """CRC16/Modbus (reflected 0xA001) remainder for every byte value"""
+    table = array.array('H')
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc = crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC_TABLE = _build_crc_table()
+
+# Consecutive failures of the preferred transport before the other one is tried
+_TRANSPORT_FALLBACK_THRESHOLD = 3
+
 
 class ModbusRelayController:
     """Controller for Modbus TCP relay controllers like Waveshare 30CH"""
@@ -53,16 +86,52 @@ class ModbusRelayController:
         self.connected = False
         self.client = None
         self.last_connection_attempt = 0
-        self.connection_cooldown = 30  # seconds between connection attempts
         self.last_error = None
         self.in_cooldown = False
-        self.cooldown_until = None
+        self.cooldown_until = None  # Wall-clock end of the cooldown, for status reporting
+        self._cooldown_until_str = None  # cooldown_until preformatted for get_connection_status()
+        self._cooldown_deadline = 0.0  # Same moment on the monotonic clock, used for the checks
+        
+        # Circuit breaker for connection attempts: CLOSED (normal), OPEN (backing off until
+        # cooldown_until), HALF_OPEN (one probe in flight). Backoff doubles per consecutive failure.
+        self._breaker_state = 'CLOSED'
+        self._consecutive_failures = 0
+        self._backoff_base = 1.0
+        self._backoff_max = 60.0
+        self._breaker_lock = threading.Lock()
+        self._reconnect_thread = None
+        
+        # Persistent socket for direct RTU-over-TCP commands, reused across writes, and the
+        # selector used to wait for its replies
+        self._sock = None
+        self._sel = None
         
-        # Local cache of relay states
-        self._relay_states = [False] * channels
+        # Write transport that last succeeded ('socket' = direct RTU frames, 'pymodbus' =
+        # ModbusTcpClient) and consecutive failures per transport
+        self._preferred_transport = 'socket'
+        self._transport_failures = {'socket': 0, 'pymodbus': 0}
         
-        # Add a lock for thread safety
+        # Local cache of relay states as a bitmask: bit N set means channel N is ON
+        self._state_mask = 0
+        self._channel_range = range(channels)  # The channel count never changes
+        
+        # 1 where the cached state is known to match the device (last write confirmed).
+        # Cleared at startup, on every new write and whenever the connection fails.
+        self._cache_is_authoritative = bytearray(channels)
+        
+        # Complete write-coil frames by (channel, state); at most 2 * channels entries
+        self._frame_cache = {}
+        
+        # Add a lock for thread safety. self.lock only guards the state cache and is never
+        # held across device I/O, so cache reads/updates don't wait behind in-flight writes.
+        # _io_lock serializes the socket / pymodbus client (re-entrant: writes may connect()).
         self.lock = threading.Lock()
+        self._io_lock = threading.RLock()
+        
+        # Write-behind queue for set_relay(): channel numbers whose cached state still has
+        # to reach the device. The worker thread starts on first use.
+        self._write_q = queue.SimpleQueue()
+        self._write_thread = None
         
         # Map of light zones to relay channels for the vertical farm system
         # This mapping is used by the light controller to control specific lights
@@ -77,6 +146,13 @@ class ModbusRelayController:
             7: {'a': 13, 'b': 14},  # Light Zone 7 uses channels 13 & 14
         }
         
+        # Flat 'light_1a' -> channel lookup so string channels resolve without parsing
+        self._string_channel_map = {
+            f"light_{zone}{section}": channel
+            for zone, sections in self.light_zone_mapping.items()
+            for section, channel in sections.items()
+        }
+        
         # Try to connect immediately if not in simulation mode
         if not simulation_mode:
             if not MODBUS_AVAILABLE:
@@ -87,32 +163,31 @@ class ModbusRelayController:
     
     def connect(self) -> bool:
         """Connect to the Modbus TCP relay controller"""
+        with self._io_lock:
+            return self._connect()
+    
+    def _connect(self) -> bool:
         if self.simulation_mode:
             logger.info("Simulation mode active - not connecting to physical relay controller")
             return False
         
-        # Check if we're in cooldown period
+        # Check the circuit breaker before touching the network
         now = time.time()
-        if self.in_cooldown and self.cooldown_until and now < self.cooldown_until:
-            remaining = int(self.cooldown_until - now)
-            logger.warning(f"Connection in cooldown for {remaining} more seconds")
+        if not self._breaker_allows_attempt():
             return False
-            
-        self.in_cooldown = False
+        
         self.last_connection_attempt = now
         
         # Try to connect using the direct socket method first (most reliable for Waveshare)
         try:
             logger.info(f"Attempting direct socket connection to relay at {self.host}:{self.port}")
             
-            # Create a new socket connection
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(self.connection_timeout)
-            sock.connect((self.host, self.port))
+            # Open (or reuse) the persistent command socket
+            self._get_socket()
             
             # For Waveshare relays, a successful socket connection is enough to consider connected
             self.connected = True
-            sock.close()
+            self._record_breaker_success()
             
             logger.info(f"Successfully connected to relay at {self.host}:{self.port} via direct socket")
             return True
@@ -142,85 +217,116 @@ class ModbusRelayController:
                     
                     # Connection successful
                     self.connected = True
-                    self.last_error = None
+                    self._record_breaker_success()
                     logger.info(f"Successfully connected to Modbus relay at {self.host}:{self.port}")
                     return True
                     
                 except Exception as e:
-                    self.last_error = str(e)
-                    self.connected = False
-                    
-                    # Start cooldown period for connection attempts
-                    self.in_cooldown = True
-                    self.cooldown_until = now + self.connection_cooldown
+                    # Open the breaker; the backoff grows with consecutive failures
+                    self._record_breaker_failure(e, now)
                     
                     logger.error(f"Failed to connect to Modbus relay: {e}")
                     return False
             else:
+                self._record_breaker_failure(e, now)
                 logger.error("Modbus library not available and direct socket failed")
                 return False
     
+    def _breaker_allows_attempt(self) -> bool:
+        """Return True if a connection attempt may run now (CLOSED, or the single HALF_OPEN probe)"""
+        with self._breaker_lock:
+            if self._breaker_state == 'OPEN':
+                remaining = self._cooldown_deadline - time.monotonic()
+                if remaining > 0:
+                    logger.debug(f"Connection in cooldown for {remaining:.1f} more seconds")
+                    return False
+                # Backoff elapsed: this caller becomes the probe
+                self._breaker_state = 'HALF_OPEN'
+                return True
+            if self._breaker_state == 'HALF_OPEN':
+                return False  # Another thread is already probing
+            return True
+    
+    def _record_breaker_success(self):
+        """Close the breaker after a successful connection or write"""
+        with self._breaker_lock:
+            self._breaker_state = 'CLOSED'
+            self._consecutive_failures = 0
+            self.in_cooldown = False
+            self.cooldown_until = None
+            self._cooldown_until_str = None
+            self.last_error = None
+    
+    def _record_breaker_failure(self, error, now=None):
+        """Open the breaker with exponential backoff after a failed connection or write"""
+        if now is None:
+            now = time.time()
+        with self._breaker_lock:
+            self._consecutive_failures += 1
+            backoff = min(self._backoff_max, self._backoff_base * 2 ** (self._consecutive_failures - 1))
+            self._breaker_state = 'OPEN'
+            self.in_cooldown = True
+            self.cooldown_until = now + backoff
+            self._cooldown_until_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.cooldown_until))
+            self._cooldown_deadline = time.monotonic() + backoff
+            self.last_error = str(error)
+            self.connected = False
+            # The device may have reset while unreachable, so no cached state can be trusted
+            self._cache_is_authoritative = bytearray(self.channels)
+        logger.warning(f"Relay connection failure #{self._consecutive_failures}, retrying in {backoff:.0f}s")
+    
     def disconnect(self) -> bool:
         """Disconnect from the Modbus relay controller"""
-        if self.client:
-            self.client.close()
-            self.connected = False
-            logger.info("Disconnected from Modbus relay controller")
-            return True
-        return False
+        with self._io_lock:
+            self._close_socket()
+            if self.client:
+                self.client.close()
+                self.connected = False
+                logger.info("Disconnected from Modbus relay controller")
+                return True
+            return False
+    
+    def get_relay_bit(self, channel: int) -> bool:
+        """Cached state of a validated integer channel"""
+        return bool((self._state_mask >> channel) & 1)
+    
+    def set_relay_bit(self, channel: int, state: bool):
+        """Update the cached state of a validated integer channel"""
+        if state:
+            self._state_mask |= 1 << channel
+        else:
+            self._state_mask &= ~(1 << channel)
     
     def get_all_relay_states(self) -> Dict[int, bool]:
         """Get a dictionary of all relay states {channel: state}"""
-        states = {}
         # In a real implementation, we would read from the device here
         # But for reliability, just return our cached states
-        for channel in range(min(self.channels, len(self._relay_states))):
-            states[channel] = self._relay_states[channel]
-            
-        return states
+        m = self._state_mask  # One atomic snapshot of the int, so no lock is needed
+        return {channel: bool((m >> channel) & 1) for channel in self._channel_range}
     
     def read_actual_fan_states(self, fan_channels: List[int]) -> Dict[int, bool]:
         """Read actual hardware states for fan channels - simplified implementation"""
-        hardware_states = {}
-        
         # Return current cached states (updated whenever relays are controlled)
-        for channel in fan_channels:
-            if 0 <= channel < len(self._relay_states):
-                hardware_states[channel] = self._relay_states[channel]
-                
-        return hardware_states
+        return self.read_hardware_relay_states(fan_channels)
     
     def read_hardware_relay_states(self, channels: List[int]) -> Dict[int, bool]:
         """Read hardware relay states - simplified implementation using cached states"""
-        hardware_states = {}
+        m = self._state_mask
+        valid = self._channel_range
         
         # Return current cached states (updated whenever relays are controlled)
-        for channel in channels:
-            if 0 <= channel < len(self._relay_states):
-                hardware_states[channel] = self._relay_states[channel]
-        
-        return hardware_states
+        return {channel: bool((m >> channel) & 1) for channel in channels if channel in valid}
     
     def get_relay(self, channel) -> bool:
         """Get the state of a specific relay channel"""
         # For backward compatibility with the existing light controller
         # which uses 'light_1a', 'light_2b' style channel names
-        if isinstance(channel, str) and channel.startswith('light_'):
-            try:
-                # Extract zone number and section from format "light_1a"
-                zone_str = channel[6:-1]  # Remove "light_" and last character
-                section = channel[-1]     # Last character (a or b)
-                zone = int(zone_str)
-                
-                # Use the mapping to find the actual channel number
-                if zone in self.light_zone_mapping and section in self.light_zone_mapping[zone]:
-                    channel = self.light_zone_mapping[zone][section]
-                else:
-                    logger.warning(f"Unknown light zone mapping: {channel}")
-                    return False
-            except Exception as e:
-                logger.error(f"Error parsing light channel {channel}: {e}")
+        if type(channel) is str and channel.startswith('light_'):
+            mapped = self._string_channel_map.get(channel)
+            if mapped is None:
+                logger.warning(f"Unknown light zone mapping: {channel}")
                 return False
+            channel = mapped
                 
         # Convert channel number to int
         try:
@@ -234,61 +340,63 @@ class ModbusRelayController:
             logger.warning(f"Channel {channel} out of range (0-{self.channels-1})")
             return False
             
-        # Return cached state in simulation mode
-        if self.simulation_mode:
-            return self._relay_states[channel]
-        
-        # Return cached state instead of reading from device
+        # Return cached state instead of reading from device (also in simulation mode)
         # This improves reliability when checking state for UI display
-        return self._relay_states[channel]
+        return bool((self._state_mask >> channel) & 1)
     
     def set_relay(self, channel, state) -> bool:
-        """Set the state of a specific relay channel"""
+        """Set the state of a specific relay channel without waiting for the device
+        
+        The cached state is updated immediately and the write is queued for the background
+        writer, which batches queued channels and retries until the device accepts them.
+        Returns True once the write is accepted; use set_relay_sync() to wait for the device.
+        """
+        return self._set_relay(channel, state, wait=False)
+    
+    def set_relay_sync(self, channel, state) -> bool:
+        """Set the state of a specific relay channel and wait for the device to confirm it"""
+        return self._set_relay(channel, state, wait=True)
+    
+    def _set_relay(self, channel, state, wait) -> bool:
         with self.lock:  # Thread safety
             # ENHANCED: Better debug logging to track what's calling this method
+            # Caller details only feed INFO/DEBUG records, so skip the frame walk when those are off.
+            # Walk f_back directly: inspect.stack() would also read source lines for every frame.
             caller_info = ""
             call_stack = ""
-            try:
-                import inspect
-                frame = inspect.currentframe()
-                if frame and frame.f_back:
-                    caller_frame = frame.f_back
+            if logger.isEnabledFor(logging.INFO):
+                try:
+                    caller_frame = sys._getframe(2)  # Skip the set_relay/set_relay_sync wrapper
                     caller_info = f" (called from {caller_frame.f_code.co_filename}:{caller_frame.f_lineno} in {caller_frame.f_code.co_name})"
                     
                     # Get full call stack for fan channels (17-24)
                     if isinstance(channel, int) and 17 <= channel <= 24:
-                        stack = inspect.stack()
                         call_stack = "\nCall stack for fan relay:\n"
-                        for i, frame_info in enumerate(stack[1:4]):  # Show top 3 callers
-                            call_stack += f"  {i+1}. {frame_info.filename}:{frame_info.lineno} in {frame_info.function}\n"
-            except:
-                pass
+                        frame = caller_frame
+                        for i in range(3):  # Show top 3 callers
+                            if frame is None:
+                                break
+                            call_stack += f"  {i+1}. {frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}\n"
+                            frame = frame.f_back
+                except ValueError:
+                    pass
             
             # ADDED: Special logging for fan channels to track automatic control
             if isinstance(channel, int) and 17 <= channel <= 24:
-                logger.info(f"🌀 FAN CONTROL: Channel {channel} -> {'ON' if state else 'OFF'}{caller_info}{call_stack}")
+                logger.info("🌀 FAN CONTROL: Channel %s -> %s%s%s", channel, 'ON' if state else 'OFF', caller_info, call_stack)
             elif isinstance(channel, int) and channel == 16:
-                logger.info(f"🚰 WATER PUMP: Channel {channel} -> {'ON' if state else 'OFF'}{caller_info}")
+                logger.info("🚰 WATER PUMP: Channel %s -> %s%s", channel, 'ON' if state else 'OFF', caller_info)
             else:
-                logger.debug(f"set_relay called: channel={channel}, state={state}{caller_info}")
+                logger.debug("set_relay called: channel=%s, state=%s%s", channel, state, caller_info)
             
             # Handle string channel names (same as get_relay)
-            if isinstance(channel, str) and channel.startswith('light_'):
-                try:
-                    zone_str = channel[6:-1]
-                    section = channel[-1]
-                    zone = int(zone_str)
-                    
-                    if zone in self.light_zone_mapping and section in self.light_zone_mapping[zone]:
-                        original_channel = channel
-                        channel = self.light_zone_mapping[zone][section]
-                        logger.debug(f"Mapped light channel {original_channel} to relay {channel}")
-                    else:
-                        logger.warning(f"Unknown light zone mapping: {channel}")
-                        return False
-                except Exception as e:
-                    logger.error(f"Error parsing light channel {channel}: {e}")
+            if type(channel) is str and channel.startswith('light_'):
+                mapped = self._string_channel_map.get(channel)
+                if mapped is None:
+                    logger.warning(f"Unknown light zone mapping: {channel}")
                     return False
+                logger.debug("Mapped light channel %s to relay %s", channel, mapped)
+                channel = mapped
             
             # Convert channel and state to appropriate types
             try:
@@ -304,110 +412,415 @@ class ModbusRelayController:
                 return False
                 
             # Update cache immediately even in simulation mode
-            old_state = self._relay_states[channel]
-            self._relay_states[channel] = state
+            old_state = self.get_relay_bit(channel)
+            self.set_relay_bit(channel, state)
             
             # ADDED: Only log actual state changes to reduce noise
             if old_state != state:
-                logger.info(f"Relay {channel} state changed: {old_state} -> {state}{caller_info}")
+                logger.info("Relay %s state changed: %s -> %s%s", channel, old_state, state, caller_info)
             else:
-                logger.debug(f"Relay {channel} state unchanged: {state}")
+                logger.debug("Relay %s state unchanged: %s", channel, state)
+            
+            # The device is already confirmed in this state: skip the I/O entirely
+            if old_state == state and self._cache_is_authoritative[channel]:
+                return True
+            self._cache_is_authoritative[channel] = 0  # Cache is now ahead of the device
             
             # In simulation mode, just return success
             if self.simulation_mode:
                 return True
-                
-            # If not connected, try to connect
-            if not self.connected:
-                if not self.connect():
+            
+            if not wait:
+                self._queue_write(channel)
+                return True
+        
+        # Device I/O happens outside self.lock
+        result = self._write_states((channel,))
+        if result and old_state != state:
+            logger.info("Relay %s set to %s", channel, 'ON' if state else 'OFF')
+        return result
+    
+    def set_relays(self, states: Dict[int, bool]) -> bool:
+        """
+        Set several relay channels in one call
+        
+        Args:
+            states (dict): {channel: state} for every channel to write
+            
+        Returns:
+            bool: True if all channels were written
+        """
+        with self.lock:  # Thread safety
+            # Validate everything before touching the cache or the device
+            validated = {}
+            for channel, state in states.items():
+                try:
+                    channel = int(channel)
+                except (ValueError, TypeError):
+                    logger.error(f"Invalid channel type: {type(channel)}")
                     return False
+                if not (0 <= channel < self.channels):
+                    logger.warning(f"Channel {channel} out of range (0-{self.channels-1})")
+                    return False
+                validated[channel] = bool(state)
             
-            try:
-                # First try the direct socket method with exact commands - most reliable for Waveshare
-                result = self._send_direct_command(channel, state)
-                if result:
-                    # CHANGED: Only log if state actually changed
-                    if old_state != state:
-                        logger.info(f"Relay {channel} set to {'ON' if state else 'OFF'} using direct command")
-                    return True
-                
-                # If socket method fails, try with ModbusTcpClient
-                logger.warning(f"Direct command failed, trying ModbusTcpClient for relay {channel}")
-                if MODBUS_AVAILABLE and self.client:
-                    # FIXED: Apply same hardware offset for ModbusTcpClient
-                    hardware_channel = channel - 1
-                    response = self.client.write_coil(hardware_channel, state)
-                    if not hasattr(response, 'isError') or not response.isError():
-                        logger.info(f"Relay {channel} set to {'ON' if state else 'OFF'} using ModbusTcpClient (hardware address {hardware_channel})")
-                        return True
-                
-                # Both methods failed
-                logger.error(f"Failed to set relay {channel} to {state} with all methods")
+            # Drop channels the device is already confirmed to be in
+            mask = self._state_mask
+            authoritative = self._cache_is_authoritative
+            validated = {channel: state for channel, state in validated.items()
+                         if not (authoritative[channel] and bool((mask >> channel) & 1) == state)}
+            
+            if not validated:
+                return True
+            for channel in validated:
+                authoritative[channel] = 0
+            
+            # Update cache immediately even in simulation mode
+            mask = self._state_mask
+            for channel, state in validated.items():
+                if state:
+                    mask |= 1 << channel
+                else:
+                    mask &= ~(1 << channel)
+            self._state_mask = mask
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Bulk relay write: %s channels %s", len(validated), sorted(validated))
+            
+            # In simulation mode, just return success
+            if self.simulation_mode:
+                return True
+        
+        return self._write_states(validated)
+    
+    def _write_states(self, channels) -> bool:
+        """Write the cached state of validated channels to the device (caller must not hold self.lock)
+        
+        The states are read from the cache only once _io_lock is held, so whichever
+        writer reaches the device last sends the newest cached state; a write that
+        was overtaken while waiting for the socket cannot undo a later one.
+        """
+        with self._io_lock:
+            with self.lock:
+                m = self._state_mask
+            return self._write_states_locked({channel: bool((m >> channel) & 1) for channel in channels})
+    
+    def _write_states_locked(self, validated: Dict[int, bool]) -> bool:
+        # If not connected, try to connect
+        if not self.connected:
+            if not self.connect():
                 return False
-                
+        
+        # Start with the transport that last worked. Only fall back to the other one once
+        # the preferred transport keeps failing, so a transient error costs one timeout
+        # (the circuit breaker retries) instead of two on every write.
+        preferred = self._preferred_transport
+        other = 'pymodbus' if preferred == 'socket' else 'socket'
+        for transport in (preferred, other):
+            if transport == other:
+                if self._transport_failures[preferred] < _TRANSPORT_FALLBACK_THRESHOLD:
+                    break
+                logger.warning(f"{preferred} transport keeps failing, trying {other} for relays {sorted(validated)}")
+            
+            try:
+                if transport == 'socket':
+                    ok = self._send_direct_commands(validated)
+                else:
+                    ok = self._write_coils_pymodbus(validated)
             except Exception as e:
-                logger.error(f"Error setting relay {channel} to {state}: {e}")
-                self.connected = False
-                self.last_error = str(e)
-                return False
+                logger.error(f"Error setting relays {sorted(validated)} via {transport}: {e}")
+                ok = False
+            
+            if ok:
+                self._transport_failures[transport] = 0
+                if transport != preferred:
+                    logger.info(f"Relay writes now prefer the {transport} transport")
+                    self._preferred_transport = transport
+                self._record_breaker_success()
+                self._mark_authoritative(validated)
+                return True
+            self._transport_failures[transport] += 1
+        
+        logger.error(f"Failed to set relays {sorted(validated)}")
+        self._record_breaker_failure(f"Failed to set relays {sorted(validated)}")
+        return False
     
-    def _send_direct_command(self, channel, state):
-        """Send direct command to relay using the most reliable method for Waveshare"""
-        try:
-            # Create a new socket
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(self.connection_timeout)
+    def _write_coils_pymodbus(self, validated: Dict[int, bool]) -> bool:
+        """Write {channel: state} one coil at a time through ModbusTcpClient"""
+        if not (MODBUS_AVAILABLE and self.client):
+            return False
+        all_ok = True
+        for channel, state in validated.items():
+            # Same 1-based hardware offset as the direct frames
+            response = self.client.write_coil(channel - 1, state)
+            if hasattr(response, 'isError') and response.isError():
+                all_ok = False
+        return all_ok
+    
+    def _mark_authoritative(self, written: Dict[int, bool]):
+        """Record that the device confirmed these {channel: state} writes
+        
+        A channel whose cached state changed while the write was in flight stays
+        non-authoritative; its newer write is still pending.
+        """
+        with self.lock:
+            mask = self._state_mask
+            authoritative = self._cache_is_authoritative
+            for channel, state in written.items():
+                if bool((mask >> channel) & 1) == state:
+                    authoritative[channel] = 1
+    
+    def _queue_write(self, channel):
+        """Queue a channel for the background writer, starting it if needed"""
+        if self._write_thread is None or not self._write_thread.is_alive():
+            self._write_thread = threading.Thread(target=self._write_worker, name='relay_writer', daemon=True)
+            self._write_thread.start()
+        self._write_q.put(channel)
+    
+    def _write_worker(self):
+        """Apply queued set_relay() writes in batches
+        
+        Each batch is written through _write_states, which reads the queued channels'
+        cached state once it owns the device, so a batch that loses the race with a
+        set_relay_sync()/set_relays() write re-sends that newer state rather than an
+        older one. Batches are not otherwise ordered against direct writes.
+        """
+        write_q = self._write_q
+        while True:
+            channels = {write_q.get()}
+            # Give a burst of set_relay() calls a moment to coalesce into one batch
+            while len(channels) < self.channels:
+                try:
+                    channels.add(write_q.get(timeout=0.001))
+                except queue.Empty:
+                    break
             
+            if self._write_states(channels):
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Background write applied to relays %s", sorted(channels))
+                continue
+            
+            # Keep the writes and retry once the circuit breaker allows another attempt
+            delay = max(0.5, self._cooldown_deadline - time.monotonic())
+            logger.warning(f"Background write to relays {sorted(channels)} failed, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            for channel in channels:
+                write_q.put(channel)
+    
+    def _build_write_coil_frame(self, channel, state):
+        """Build a Modbus RTU write-single-coil frame (with CRC) for a software channel"""
+        key = (channel, state)
+        frame = self._frame_cache.get(key)
+        if frame is not None:
+            return frame
+        
+        # Format command using Modbus RTU format
+        # Function code 5 (0x05) for write single coil
+        # ON = 0xFF00, OFF = 0x0000
+        # FIXED: Subtract 1 from channel because hardware uses 1-based addressing
+        # Software channel 16 should control hardware relay 16, not 17
+        hardware_channel = channel - 1
+        cmd = struct.pack(
+            '>BBHH',
+            0x01,                          # Unit ID
+            0x05,                          # Function code (write single coil)
+            hardware_channel,              # Coil address - hardware offset corrected
+            0xFF00 if state else 0x0000,   # Value
+        )
+        
+        # Append CRC16 (specific to Modbus RTU)
+        frame = self._frame_cache[key] = cmd + self._calculate_modbus_crc(cmd)
+        return frame
+    
+    def _build_write_coils_frame(self, states):
+        """Build a Modbus RTU write-multiple-coils (0x0F) frame for a contiguous run of channels"""
+        channels = sorted(states)
+        hardware_start = channels[0] - 1  # Same 1-based hardware offset as write single coil
+        quantity = len(channels)
+        
+        # Coil values packed LSB first, 8 per byte
+        data = bytearray((quantity + 7) // 8)
+        for i, channel in enumerate(channels):
+            if states[channel]:
+                data[i >> 3] |= 1 << (i & 7)
+        
+        cmd = struct.pack(
+            '>BBHHB',
+            0x01,             # Unit ID
+            0x0F,             # Function code (write multiple coils)
+            hardware_start,   # Start address
+            quantity,         # Number of coils
+            len(data),        # Byte count
+        ) + data
+        return cmd + self._calculate_modbus_crc(cmd)
+    
+    def _build_write_frames(self, states):
+        """Split {channel: state} into contiguous runs: one 0x0F frame per run, 0x05 for single channels
+        
+        Gaps are never filled from the local cache, since it does not reflect relays switched
+        outside this process (e.g. before a restart).
+        """
+        runs = []
+        for channel in sorted(states):
+            if runs and channel == runs[-1][-1] + 1:
+                runs[-1].append(channel)
+            else:
+                runs.append([channel])
+        
+        frames = []
+        for run in runs:
+            if len(run) == 1:
+                channel = run[0]
+                frames.append((run, self._build_write_coil_frame(channel, states[channel])))
+            else:
+                frames.append((run, self._build_write_coils_frame({channel: states[channel] for channel in run})))
+        return frames
+    
+    @staticmethod
+    def _describe_run(run):
+        """Human-readable channel/address range for log messages"""
+        if len(run) == 1:
+            return f"Software Channel {run[0]} -> Hardware Address {run[0] - 1}"
+        return f"Software Channels {run[0]}-{run[-1]} -> Hardware Addresses {run[0] - 1}-{run[-1] - 1}"
+    
+    def _get_socket(self):
+        """Return the persistent command socket, opening a new one if there is none"""
+        sock = self._sock
+        if sock is not None:
             try:
-                # Connect to the relay
-                s.connect((self.host, self.port))
-                
-                # Format command using Modbus RTU format
-                # Function code 5 (0x05) for write single coil
-                # ON = 0xFF00, OFF = 0x0000
-                # FIXED: Subtract 1 from channel because hardware uses 1-based addressing
-                # Software channel 16 should control hardware relay 16, not 17
-                hardware_channel = channel - 1
-                cmd = bytearray([
-                    0x01,                    # Unit ID
-                    0x05,                    # Function code (write single coil)
-                    0x00, hardware_channel,  # Coil address (high byte, low byte) - hardware offset corrected
-                    0xFF if state else 0x00, # Value (high byte)
-                    0x00,                    # Value (low byte)
-                ])
-                
-                # Calculate CRC16 (specific to Modbus RTU)
-                crc = self._calculate_modbus_crc(cmd)
-                cmd.extend(crc)
-                
-                # Send the command
-                logger.info(f"🔧 MODBUS DEBUG: Software Channel {channel} -> Hardware Address {hardware_channel} -> Command: {' '.join(f'{b:02x}' for b in cmd)}")
-                s.send(cmd)
-                
-                # Give device time to process
-                time.sleep(0.1)
-                
-                # Success
-                return True
-                
-            finally:
-                s.close()
-                
+                sock.getpeername()
+                return sock
+            except OSError:
+                self._close_socket()
+        
+        # Resolve the host and try every address in turn (as create_connection does),
+        # setting the socket options before connect() so they apply to the handshake
+        error = None
+        for family, socktype, proto, _, address in socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM):
+            sock = socket.socket(family, socktype, proto)
+            try:
+                self._configure_socket(sock)
+                sock.settimeout(self.connection_timeout)
+                sock.connect(address)
+                sock.settimeout(self.read_timeout)
+                break
+            except OSError as e:
+                sock.close()
+                error = e
+        else:
+            raise error if error is not None else OSError(f"getaddrinfo returned nothing for {self.host}")
+        
+        self._sock = sock
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(sock, selectors.EVENT_READ)
+        logger.info(f"Opened persistent relay socket to {self.host}:{self.port}")
+        return sock
+    
+    @staticmethod
+    def _configure_socket(sock):
+        """Set the command socket's options; called before connect()"""
+        # Reconnect storms must not pile up TIME_WAIT sockets: close with RST
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        # Keepalive so a silently dropped device is noticed instead of hanging the socket
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in (('TCP_KEEPIDLE', 30), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3)):
+            if hasattr(socket, option):  # Linux-only tuning knobs
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+        # Frames are tiny and must go out immediately: no Nagle, small buffers
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    
+    def _close_socket(self):
+        """Close the persistent command socket so the next command reconnects"""
+        sock, sel = self._sock, self._sel
+        self._sock = self._sel = None
+        if sel is not None:
+            sel.close()
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+    
+    def _send_direct_commands(self, states):
+        """Send {channel: state} over the persistent socket, batching contiguous channels per frame
+        
+        All frames of a batch are written with one sendall(); the replies are then reaped in
+        order, since the device answers frames in the order it received them.
+        """
+        try:
+            s = self._get_socket()
+            frames = self._build_write_frames(states)
+            
+            if logger.isEnabledFor(logging.INFO):
+                for run, cmd in frames:
+                    logger.info("🔧 MODBUS DEBUG: %s -> Command: %s", self._describe_run(run), cmd.hex(' '))
+            s.sendall(b''.join(cmd for _, cmd in frames))
+            
+            for run, cmd in frames:
+                # Wait for the device's acknowledgement (bounded by read_timeout per frame)
+                if not self._read_write_reply(cmd, time.monotonic() + self.read_timeout):
+                    logger.error(f"Relay did not acknowledge {self._describe_run(run)}")
+                    self._close_socket()  # Resynchronize on a fresh connection
+                    return False
+            
+            # Success
+            return True
+        
+        except socket.timeout:
+            # A late reply would be read as the answer to a later frame, so drop the connection
+            logger.error(f"No reply from relay within {self.read_timeout}s for relays {list(states)}")
+            self._close_socket()
+            return False
+        
         except Exception as e:
-            logger.error(f"Error in direct command for relay {channel}: {e}")
+            logger.error(f"Error in direct command for relays {list(states)}: {e}")
+            self._close_socket()
             return False
     
+    def _recv(self, size, deadline):
+        """recv() from the command socket once the selector reports data, or time out at deadline"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not self._sel.select(remaining):
+            raise socket.timeout("timed out waiting for relay reply")
+        return self._sock.recv(size)
+    
+    def _read_write_reply(self, cmd, deadline):
+        """Read the reply to a write frame; True if it acknowledges exactly that write
+        
+        Write single coil echoes the request and write multiple coils returns the same
+        unit/function/address/quantity header, so both replies match cmd[:6]. Exception
+        replies (function | 0x80) are only 5 bytes long.
+        """
+        reply = b''
+        expected = 8
+        while len(reply) < expected:
+            chunk = self._recv(expected - len(reply), deadline)
+            if not chunk:
+                raise ConnectionError("Relay closed the connection")
+            reply += chunk
+            if len(reply) >= 2 and reply[1] & 0x80:
+                expected = 5
+        
+        if reply[:6] == cmd[:6]:
+            return True
+        if reply[1] & 0x80:
+            logger.error(f"Relay returned Modbus exception code {reply[2]} for function {cmd[1]:#04x}")
+        else:
+            logger.error(f"Unexpected relay reply: {reply.hex(' ')}")
+        return False
+    
     def _calculate_modbus_crc(self, data):
-        """Calculate Modbus RTU CRC16"""
+        """Calculate Modbus RTU CRC16 (crcmod C extension if available, else table driven)"""
+        if _crc16_modbus is not None:
+            return struct.pack('<H', _crc16_modbus(bytes(data)))
+        
         crc = 0xFFFF
+        table = _CRC_TABLE
         for b in data:
-            crc ^= b
-            for _ in range(8):
-                if crc & 0x0001:
-                    crc = (crc >> 1) ^ 0xA001
-                else:
-                    crc = crc >> 1
-        return bytearray([crc & 0xFF, (crc >> 8) & 0xFF])
+            crc = (crc >> 8) ^ table[(crc ^ b) & 0xFF]
+        return bytes((crc & 0xFF, crc >> 8))
     
     def get_connection_status(self) -> Dict[str, Any]:
         """Get the current connection status"""
@@ -420,16 +833,18 @@ class ModbusRelayController:
                 "in_cooldown": False,
                 "cooldown_until": None,
                 "simulation_mode": True,
-                "current_time": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                "current_time": time.strftime('%Y-%m-%d %H:%M:%S')
             }
             
-        # Try to reconnect if not connected and not in cooldown
-        now = time.time()
-        can_retry = not self.connected and not self.in_cooldown and (now - self.last_connection_attempt) > self.connection_cooldown
-        
-        if can_retry:
-            logger.info("Attempting automatic reconnection during status check")
-            self.connect()
+        # Never block the status call on the network: kick off a background reconnect
+        # when the breaker would allow one, and report the breaker state as-is
+        if (not self.connected and self._breaker_state != 'HALF_OPEN' and
+                time.monotonic() >= self._cooldown_deadline):
+            reconnect_thread = self._reconnect_thread
+            if reconnect_thread is None or not reconnect_thread.is_alive():
+                logger.info("Starting background reconnection from status check")
+                self._reconnect_thread = threading.Thread(target=self.connect, name='relay_reconnect', daemon=True)
+                self._reconnect_thread.start()
         
         return {
             "connected": self.connected,
@@ -439,7 +854,9 @@ class ModbusRelayController:
             "channels": self.channels,
             "last_error": self.last_error,
             "in_cooldown": self.in_cooldown,
-            "cooldown_until": datetime.datetime.fromtimestamp(self.cooldown_until).strftime('%Y-%m-%d %H:%M:%S') if self.cooldown_until else None,
+            "breaker_state": self._breaker_state,
+            "consecutive_failures": self._consecutive_failures,
+            "cooldown_until": self._cooldown_until_str,
             "simulation_mode": self.simulation_mode,
-            "current_time": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            "current_time": time.strftime('%Y-%m-%d %H:%M:%S')
         }
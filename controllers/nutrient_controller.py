@@ -2,17 +2,68 @@
 
 import time
 import datetime
+import collections
+import heapq
+import itertools
 import logging
+import random
 import threading
 from typing import Dict, List, Optional, Any
 
 logger = logging.getLogger(__name__)
 
+
+class PumpState:
+    """Runtime state of one dosing pump
+    
+    gate is held for the whole of a dose and only ever taken with
+    acquire(blocking=False). token identifies the dose holding it, so a late
+    completion callback cannot release a gate that a newer dose has since taken.
+    """
+    __slots__ = ('name', 'state', 'last_dose_time', 'daily_total_ml', 'flow_rate_ml_per_sec', 'gate', 'token')
+
+    def __init__(self, name, flow_rate_ml_per_sec=1.75):
+        self.name = name
+        self.state = False
+        self.last_dose_time = 0
+        self.daily_total_ml = 0.0
+        self.flow_rate_ml_per_sec = flow_rate_ml_per_sec  # Fixed flow rate
+        self.gate = threading.Lock()
+        self.token = None
+
+    @property
+    def busy(self):
+        """True while a dose on this pump is in progress"""
+        return self.gate.locked()
+
+
 class NutrientController:
+    # Fixed attribute set: no per-instance __dict__, and a typo'd attribute
+    # assignment raises instead of silently creating a new field
+    __slots__ = (
+        'db', 'socketio', 'sensor_manager', 'logger',
+        '_has_connected_attr', '_has_circuit_breaker', '_cb_open_until', '_last_emit',
+        'ec_target', 'ph_target', 'ec_tolerance', 'ph_tolerance',
+        'auto_nutrient', 'auto_ph', '_settings_snapshot', '_ec_low', '_ec_high', '_ph_high',
+        'pumps', 'dose_end_time', 'last_update_time', 'last_check_time', 'last_dose_time',
+        'settings_cache', 'dosing_state_cache', 'last_sync_time', '_sync_in_flight',
+        '_dose_log_queue', '_dose_log_lock', '_dose_tokens', '_last_readings',
+        'nutrient_a_b_dose', '_fixed_doses', 'mock_mode', '_rng',
+        'pump_endpoint_format', 'dose_action', 'status_action', '_endpoints',
+        '_pump_events', '_pump_cv', '_shutdown', '_pump_thread',
+    )
+
     def __init__(self, db, socketio, sensor_manager=None):
         self.db = db
         self.socketio = socketio
         self.sensor_manager = sensor_manager  # FIXED: Can be None now
+        # The sensor manager's type is fixed, so probe its capabilities once
+        self._has_connected_attr = sensor_manager is not None and hasattr(sensor_manager, 'connected')
+        self._has_circuit_breaker = sensor_manager is not None and hasattr(sensor_manager, 'circuit_breaker')
+        # Once the Arduino is seen offline, doses fail fast until this monotonic deadline
+        self._cb_open_until = 0.0
+        # Last monotonic emit time per (event, pump_id) for _throttled_emit
+        self._last_emit = {}
         
         # FIXED: Add logger initialization
         self.logger = logging.getLogger(__name__)
@@ -26,266 +77,365 @@ class NutrientController:
         # Control flags
         self.auto_nutrient = True  # Auto EC dosing enabled
         self.auto_ph = True        # Auto pH dosing enabled
+        self._settings_snapshot = None  # Memoized get_settings() result
+        self._update_thresholds()
         
-        # Pump configuration
+        # Pump configuration. The dict and its key set never change after __init__
+        # (nothing reassigns self.pumps), and writers only assign single PumpState
+        # fields, so readers iterate it without a lock.
         self.pumps = {
-            'nutrient_a': {
-                'name': 'Nutrient A Pump',
-                'state': False,
-                'last_dose_time': 0,
-                'daily_total_ml': 0.0,
-                'flow_rate_ml_per_sec': 1.75  # Fixed flow rate
-            },
-            'nutrient_b': {
-                'name': 'Nutrient B Pump',
-                'state': False,
-                'last_dose_time': 0,
-                'daily_total_ml': 0.0,
-                'flow_rate_ml_per_sec': 1.75  # Fixed flow rate
-            },
-            'ph_up': {
-                'name': 'pH Up Pump',
-                'state': False,
-                'last_dose_time': 0,
-                'daily_total_ml': 0.0,
-                'flow_rate_ml_per_sec': 1.75  # Fixed flow rate
-            },
-            'ph_down': {
-                'name': 'pH Down Pump',
-                'state': False,
-                'last_dose_time': 0,
-                'daily_total_ml': 0.0,
-                'flow_rate_ml_per_sec': 1.75  # Fixed flow rate
-            }
+            'nutrient_a': PumpState('Nutrient A Pump'),
+            'nutrient_b': PumpState('Nutrient B Pump'),
+            'ph_up': PumpState('pH Up Pump'),
+            'ph_down': PumpState('pH Down Pump')
         }
         
-        # Dosing status
-        self.currently_dosing = False
-        self.dose_end_time = 0
-        self.active_pump = None
+        # Dosing status (currently_dosing / active_pump are derived from the pumps)
+        self.dose_end_time = 0  # time.monotonic() deadline of the latest dose
         
         # Last update time
         self.last_update_time = 0
         self.last_check_time = 0
-        self.last_dose_time = 0  # Add missing initialization
+        # Elapsed-time bookkeeping uses time.monotonic(), which can be small right
+        # after boot, so "never" is -inf rather than 0
+        self.last_dose_time = float('-inf')  # Add missing initialization
         
         # Load settings from database
         self.settings_cache = None  # Cache for settings
         self.dosing_state_cache = None  # Cache for dosing state
-        self.last_sync_time = 0  # Last sync with database
+        self.last_sync_time = float('-inf')  # Last sync with database
+        self._sync_in_flight = False  # A background sync thread is running
+        
+        # Dosing events are queued on the dose path and written in batches
+        # (one transaction) by sync_with_database / the pump status thread
+        self._dose_log_queue = collections.deque()
+        self._dose_log_lock = threading.Lock()
+        # Last validated {'before_ph', 'before_ec'} seen by check_and_adjust_levels,
+        # logged with each dose so the dose path never reads the database
+        self._last_readings = None
         
-        # Add threading lock for dosing operations
-        self.dosing_lock = threading.Lock()
+        # Each pump has its own dosing gate (see PumpState), so different pumps
+        # dose in parallel; tokens are unique across all pumps
+        self._dose_tokens = itertools.count(1)
 
         # Fixed dose amount for Nutrient A and B
         self.nutrient_a_b_dose = 10.0
+        self.refresh_fixed_doses()
 
         # Add mock mode for testing when pumps are offline
         self.mock_mode = False
+        self._rng = random.Random()  # Private generator for mock readings
         
         # Arduino API endpoint format - can be easily changed if API changes
         self.pump_endpoint_format = "/pumps/{pump_id}"  # Update this to match your Arduino API
         self.dose_action = "dose"  # The action suffix for dosing
         self.status_action = "status"  # The action suffix for status check
+        self._endpoints = self._build_pump_endpoints()
+        
+        # Post-dose status checks run on one scheduler thread from a heap of
+        # (deadline, token, pump_id) entries instead of a Timer thread per dose
+        self._pump_events = []
+        self._pump_cv = threading.Condition()
+        self._shutdown = False
+        self._pump_thread = threading.Thread(target=self._scheduler_loop, name='nutrient_pump_status', daemon=True)
+        self._pump_thread.start()
 
     def sync_with_database(self):
-        """Periodically sync settings and dosing state with the database"""
-        now = time.time()
-        if now - self.last_sync_time > 300:  # Sync every 5 minutes
-            self.settings_cache = self.db.get_nutrient_settings()
-            self.dosing_state_cache = self.db.get_nutrient_dosing_state()
-            self.last_sync_time = now
+        """Periodically sync settings and dosing state with the database
+        
+        The database work runs on a background thread so the sensor loop never waits on it.
+        """
+        now = time.monotonic()
+        refresh = now - self.last_sync_time > 300  # Sync every 5 minutes
+        if (refresh or self._dose_log_queue) and not self._sync_in_flight:
+            self._sync_in_flight = True
+            if refresh:
+                self.last_sync_time = now
+            threading.Thread(target=self._sync_worker, args=(refresh,), name='nutrient_db_sync', daemon=True).start()
+
+    def _sync_worker(self, refresh):
+        """Flush queued dosing events and, when due, reload the cached settings"""
+        try:
+            self._flush_dose_log()
+            if refresh:
+                self.settings_cache = self.db.get_nutrient_settings()
+                self.dosing_state_cache = self.db.get_nutrient_dosing_state()
+        except Exception as e:
+            logger.error("Error syncing nutrient data with database: %s", e)
+        finally:
+            self._sync_in_flight = False
+
+    def _flush_dose_log(self):
+        """Write all queued dosing events to the database in one batch"""
+        with self._dose_log_lock:
+            queue = self._dose_log_queue
+            events = []
+            while queue:
+                events.append(queue.popleft())
+            if not events:
+                return
+            try:
+                ok = self.db.log_dosing_events_bulk(events)
+            except Exception as e:
+                logger.error("Failed to log %s dosing events: %s", len(events), e)
+                ok = False
+            if not ok:
+                # Put the batch back at the front, in order, for the next sync to retry
+                queue.extendleft(reversed(events))
 
     def validate_sensor_data(self, sensor_data):
         """Centralized validation for sensor data"""
         if not sensor_data:
             return None
-        ec = sensor_data.get('ec')
-        ph = sensor_data.get('ph')
+        try:
+            ec = sensor_data['ec']
+            ph = sensor_data['ph']
+        except KeyError:
+            ec = ph = None
         if ec is None or ph is None:
             logger.warning("Missing EC or pH data")
             return None
         return {'ec': ec, 'ph': ph}
 
+    def _build_pump_endpoints(self):
+        """Precompute the endpoint of every pump for the dose, status and bare actions"""
+        endpoints = {}
+        for pump_id in self.pumps:
+            base = self.pump_endpoint_format.format(pump_id=pump_id)
+            endpoints[(pump_id, None)] = base
+            for action in (self.dose_action, self.status_action):
+                endpoints[(pump_id, action)] = f"{base}/{action}"
+        return endpoints
+
     def get_pump_endpoint(self, pump_id, action=None):
         """Generate the proper API endpoint for a pump action
         
-        This centralizes endpoint generation to make future API changes easier
+        This centralizes endpoint generation to make future API changes easier.
+        Known pump/action pairs are served from the table built in __init__.
         """
-        endpoint = self.pump_endpoint_format.format(pump_id=pump_id)
-        if action:
-            endpoint = f"{endpoint}/{action}"
+        endpoint = self._endpoints.get((pump_id, action))
+        if endpoint is None:
+            endpoint = self.pump_endpoint_format.format(pump_id=pump_id)
+            if action:
+                endpoint = f"{endpoint}/{action}"
         return endpoint
 
+    def refresh_fixed_doses(self):
+        """Precompute (amount_ml, duration, duration_ms) for the fixed-dose pumps
+        
+        Call again after changing nutrient_a_b_dose or a nutrient pump's flow rate.
+        """
+        amount_ml = self.nutrient_a_b_dose
+        self._fixed_doses = {}
+        for pump_id in ('nutrient_a', 'nutrient_b'):
+            duration = amount_ml / self.pumps[pump_id].flow_rate_ml_per_sec
+            self._fixed_doses[pump_id] = (amount_ml, duration, int(duration * 1000))
+
     def dose(self, pump_id, amount_ml=None):
         """Unified dosing method for all types of pumps"""
-        if pump_id not in self.pumps:
-            logger.error(f"Invalid pump ID: {pump_id}")
+        pump = self.pumps.get(pump_id)
+        if pump is None:
+            logger.error("Invalid pump ID: %s", pump_id)
+            return False
+        
+        now = time.monotonic()
+        if now < self._cb_open_until:
+            # Arduino was offline moments ago: skip the gate, state and connectivity checks
+            self._throttled_emit('dosing_error', pump_id, {
+                'pump': pump_id,
+                'message': 'Arduino is offline. Cannot operate pumps.'
+            })
             return False
 
         # Use fixed dose for Nutrient A and B
-        if pump_id in ['nutrient_a', 'nutrient_b']:
-            amount_ml = self.nutrient_a_b_dose
+        fixed = self._fixed_doses.get(pump_id)
+        if fixed is not None:
+            amount_ml, duration, duration_ms = fixed
+        else:
+            # Calculate dosing duration based on flow rate
+            duration = amount_ml / pump.flow_rate_ml_per_sec
+            duration_ms = int(duration * 1000)
+        
+        # One wall-clock read for clients and the database; `now` drives all elapsed-time math
+        current_time = time.time()
             
-        with self.dosing_lock:  # Use thread lock for safety
-            # Set dosing status
-            self.currently_dosing = True
-            self.active_pump = pump_id
+        # Claim this pump's gate without waiting; a dose already in progress wins
+        if not pump.gate.acquire(blocking=False):
+            logger.warning("Dose of %s rejected: pump is already dosing", pump_id)
+            return False
+        token = next(self._dose_tokens)
+        pump.token = token
+        
+        self.dose_end_time = now + duration
+        
+        # Start dosing
+        pump.state = True
+        pump.last_dose_time = current_time
+        self.last_dose_time = now  # Update last dose time for cooldown
+        
+        # IMPORTANT CHANGE: Don't update totals or log success until we confirm pump activation
+        # We'll store the amount for later but not commit it yet
+        pending_amount = amount_ml
+        
+        # Check Arduino connection status BEFORE attempting to dose
+        arduino_connected = self._has_connected_attr and self.sensor_manager.connected
+        
+        # Notify clients that dosing is being attempted (not yet confirmed)
+        self._throttled_emit('dosing_attempt', pump_id, {
+            'pump': pump_id,
+            'name': pump.name,
+            'amount_ml': pending_amount,
+            'timestamp': current_time
+        })
+        
+        # First check actual Arduino connectivity (more reliable than mock_mode)
+        if not arduino_connected or (self._has_circuit_breaker and self.sensor_manager.circuit_breaker.is_open()):
+            logger.warning("Arduino is offline or circuit breaker open. Cannot dose %s.", pump_id)
+            self._cb_open_until = now + 1.0  # Re-check at most once a second
+            return self._fail_dose(pump_id, token, 'Arduino is offline. Cannot operate pumps.')
+        
+        # Check if we're in mock mode (manual override)
+        if self.mock_mode:
+            logger.warning("Pumps are offline. Cannot dose %s.", pump_id)
+            return self._fail_dose(pump_id, token, 'Pumps are offline. Check Arduino connection.')
             
-            # Calculate dosing duration based on flow rate
-            duration = amount_ml / self.pumps[pump_id]['flow_rate_ml_per_sec']
-            self.dose_end_time = time.time() + duration
+        # Readings from before this dose, logged with it (the batch is written later)
+        before = self._last_readings
+        
+        # Actual pump control via Arduino
+        try:
+            # Send command to Arduino to activate the pump - use non-blocking mode
+            arduino_response = self.sensor_manager.send_command(
+                self.get_pump_endpoint(pump_id, self.dose_action), 
+                {
+                    "duration_ms": duration_ms,
+                    "amount_ml": pending_amount
+                },
+                blocking=False  # Use non-blocking mode
+            )
             
-            # Start dosing
-            self.pumps[pump_id]['state'] = True
-            current_time = time.time()
-            self.pumps[pump_id]['last_dose_time'] = current_time
-            self.last_dose_time = current_time  # Update last dose time for cooldown
+            if not arduino_response:
+                logger.error("Failed to connect to pump %s: Arduino not responding", pump_id)
+                return self._fail_dose(pump_id, token, 'Failed to connect to pump - Arduino not responding')
             
-            # IMPORTANT CHANGE: Don't update totals or log success until we confirm pump activation
-            # We'll store the amount for later but not commit it yet
-            pending_amount = amount_ml
+            if not arduino_response.get('status') == 'command_sent':
+                logger.error("Failed to activate pump %s: %s", pump_id, arduino_response)
+                return self._fail_dose(pump_id, token, f"Pump error: {arduino_response.get('message', 'Unknown error')}")
             
-            # Check Arduino connection status BEFORE attempting to dose
-            arduino_connected = hasattr(self.sensor_manager, 'connected') and self.sensor_manager.connected
+            # NOW we can update totals and log success since Arduino confirmed command receipt
+            pump.daily_total_ml += pending_amount
+            logger.info("Dosed %sml using %s", pending_amount, pump.name)
             
-            # Notify clients that dosing is being attempted (not yet confirmed)
-            self.socketio.emit('dosing_attempt', {
-                'pump': pump_id,
-                'name': self.pumps[pump_id]['name'],
-                'amount_ml': pending_amount,
-                'timestamp': current_time
-            })
+            # Queue for the database; written in a batch off the dose path
+            self._dose_log_queue.append((pump_id, pending_amount, current_time, before))
             
-            # First check actual Arduino connectivity (more reliable than mock_mode)
-            if not arduino_connected or self.sensor_manager.circuit_breaker.is_open():
-                logger.warning(f"Arduino is offline or circuit breaker open. Cannot dose {pump_id}.")
-                
-                # Notify clients of offline status
-                self.socketio.emit('dosing_error', {
-                    'pump': pump_id,
-                    'message': 'Arduino is offline. Cannot operate pumps.'
-                })
-                
-                # Reset states
-                self.pumps[pump_id]['state'] = False
-                self.currently_dosing = False
-                self.active_pump = None
-                return False
+            logger.info("Started pump %s in non-blocking mode, waiting for completion", pump_id)
             
-            # Check if we're in mock mode (manual override)
-            if self.mock_mode:
-                logger.warning(f"Pumps are offline. Cannot dose {pump_id}.")
-                
-                # Notify clients of offline status
-                self.socketio.emit('dosing_error', {
-                    'pump': pump_id,
-                    'message': 'Pumps are offline. Check Arduino connection.'
-                })
-                
-                # Reset states
-                self.pumps[pump_id]['state'] = False
-                self.currently_dosing = False
-                self.active_pump = None
-                return False
-                
-            # Actual pump control via Arduino
-            try:
-                # Send command to Arduino to activate the pump - use non-blocking mode
-                arduino_response = self.sensor_manager.send_command(
-                    self.get_pump_endpoint(pump_id, self.dose_action), 
-                    {
-                        "duration_ms": int(duration * 1000),
-                        "amount_ml": pending_amount
-                    },
-                    blocking=False  # Use non-blocking mode
-                )
-                
-                if not arduino_response:
-                    logger.error(f"Failed to connect to pump {pump_id}: Arduino not responding")
-                    self.pumps[pump_id]['state'] = False
-                    self.currently_dosing = False
-                    self.active_pump = None
-                    
-                    # Notify clients of the failure
-                    self.socketio.emit('dosing_error', {
-                        'pump': pump_id,
-                        'message': 'Failed to connect to pump - Arduino not responding'
-                    })
-                    return False
-                
-                if not arduino_response.get('status') == 'command_sent':
-                    logger.error(f"Failed to activate pump {pump_id}: {arduino_response}")
-                    self.pumps[pump_id]['state'] = False
-                    self.currently_dosing = False
-                    self.active_pump = None
-                    
-                    # Notify clients of the failure
-                    self.socketio.emit('dosing_error', {
-                        'pump': pump_id,
-                        'message': f"Pump error: {arduino_response.get('message', 'Unknown error')}"
-                    })
-                    return False
-                
-                # NOW we can update totals and log success since Arduino confirmed command receipt
-                self.pumps[pump_id]['daily_total_ml'] += pending_amount
-                logger.info(f"Dosed {pending_amount}ml using {self.pumps[pump_id]['name']}")
-                
-                # Log to database
-                try:
-                    self.db.log_dosing_event(pump_id, pending_amount, current_time)
-                except Exception as e:
-                    logger.error(f"Failed to log dosing event: {str(e)}")
-                
-                logger.info(f"Started pump {pump_id} in non-blocking mode, waiting for completion")
-                
-                # For non-blocking operation, we'll set up a timer to check status periodically
-                def check_pump_status():
-                    try:
-                        status_response = self.sensor_manager.send_command(self.get_pump_endpoint(pump_id, self.status_action), blocking=True)
-                        if status_response and status_response.get('state') == 'idle':
-                            # Pump is done
-                            self.pumps[pump_id]['state'] = False
-                            self.currently_dosing = False
-                            self.active_pump = None
-                            self.socketio.emit('dosing_complete', {'pump': pump_id})
-                    except Exception as e:
-                        logger.error(f"Error checking pump status: {str(e)}")
-                        # Assume pump has completed after timeout 
-                        self.pumps[pump_id]['state'] = False
-                        self.currently_dosing = False
-                        self.active_pump = None
-                
-                # Set a timer to check status after expected duration
-                # This avoids blocking the main thread
-                timer = threading.Timer(duration * 1.2, check_pump_status)
-                timer.daemon = True
-                timer.start()
-                
-                return True
-                    
-            except Exception as e:
-                logger.error(f"Error during pump control: {str(e)}")
-                # Clean up state
-                self.pumps[pump_id]['state'] = False
-                self.currently_dosing = False
-                self.active_pump = None
-                
-                # Notify clients of the error
-                self.socketio.emit('dosing_error', {
-                    'pump': pump_id,
-                    'message': f"Error: {str(e)}"
-                })
+            # Check status after the expected duration on the scheduler thread
+            # This avoids blocking the main thread
+            with self._pump_cv:
+                heapq.heappush(self._pump_events, (now + duration * 1.2, token, pump_id))
+                self._pump_cv.notify()
+            
+            return True
                 
-                return False
+        except Exception as e:
+            logger.error("Error during pump control: %s", e)
+            return self._fail_dose(pump_id, token, f"Error: {str(e)}")
+
+    def _fail_dose(self, pump_id, token, message):
+        """Roll back a dose that could not start and tell clients why; always returns False"""
+        self._release_dose(pump_id, token)
+        self._throttled_emit('dosing_error', pump_id, {
+            'pump': pump_id,
+            'message': message
+        })
+        return False
+
+    def _throttled_emit(self, event, pump_id, payload, interval=1.0):
+        """Emit a socket event unless the same event for this pump went out within interval seconds
+        
+        Used for the per-attempt dosing_attempt/dosing_error events, which repeat
+        on every sensor tick during an outage. One-shot state transitions
+        (dosing_complete, dosing_aborted) are emitted directly.
+        """
+        key = (event, pump_id)
+        now = time.monotonic()
+        if now - self._last_emit.get(key, float('-inf')) < interval:
+            return False
+        self._last_emit[key] = now
+        self.socketio.emit(event, payload)
+        return True
+
+    def _check_pump_status(self, pump_id, token):
+        """Ask the Arduino whether a dose finished and release it"""
+        try:
+            status_response = self.sensor_manager.send_command(self.get_pump_endpoint(pump_id, self.status_action), blocking=True)
+            if status_response and status_response.get('state') == 'idle':
+                # Pump is done
+                self._release_dose(pump_id, token)
+                self.socketio.emit('dosing_complete', {'pump': pump_id})
+            else:
+                # Only checked once, so never leave the gate closed behind a busy reply
+                logger.warning("Pump %s not idle after dose: %s", pump_id, status_response)
+                self._release_dose(pump_id, token)
+        except Exception as e:
+            logger.error("Error checking pump status: %s", e)
+            # Assume pump has completed after timeout 
+            self._release_dose(pump_id, token)
+
+    def _scheduler_loop(self):
+        """Run post-dose status checks as their deadlines come due"""
+        cv = self._pump_cv
+        events = self._pump_events
+        while True:
+            with cv:
+                while not self._shutdown:
+                    if events:
+                        wait = events[0][0] - time.monotonic()
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    cv.wait(wait)
+                if self._shutdown:
+                    return
+                _, token, pump_id = heapq.heappop(events)
+            self._check_pump_status(pump_id, token)
+            self._flush_dose_log()
+
+    def stop(self):
+        """Stop the pump status scheduler (called on shutdown)"""
+        with self._pump_cv:
+            self._shutdown = True
+            self._pump_cv.notify()
+        self._flush_dose_log()
+
+    def _release_dose(self, pump_id, token):
+        """Clear the dosing state for pump_id and open its gate if this dose still holds it"""
+        pump = self.pumps[pump_id]
+        if pump.token != token:
+            return  # Aborted, and possibly re-taken by a newer dose
+        pump.state = False
+        pump.token = None
+        pump.gate.release()
+
+    @property
+    def currently_dosing(self):
+        """True while any pump is dosing"""
+        return any(pump.busy for pump in self.pumps.values())
+
+    @property
+    def active_pump(self):
+        """ID of a pump that is dosing, or None"""
+        for pump_id, pump in self.pumps.items():
+            if pump.busy:
+                return pump_id
+        return None
 
     def check_and_adjust_levels(self, sensor_data):
         """Check and adjust nutrient and pH levels"""
-        current_time = time.time()
-        
-        # Don't dose if we're currently dosing or in cooldown period
-        if self.currently_dosing or (current_time - self.last_dose_time < 300):  # 5 minute cooldown
-            return  # Skip adjustment if we dosed recently
+        current_time = time.monotonic()
         
         validated_data = self.validate_sensor_data(sensor_data)
         if not validated_data:
@@ -293,15 +443,23 @@ class NutrientController:
 
         ec = validated_data['ec']
         ph = validated_data['ph']
+        # Kept current even during cooldown so manual doses log fresh readings
+        self._last_readings = {'before_ph': ph, 'before_ec': ec}
+        
+        # Don't dose if we're currently dosing or in cooldown period
+        if self.currently_dosing or (current_time - self.last_dose_time < 300):  # 5 minute cooldown
+            return  # Skip adjustment if we dosed recently
 
+        dose = self.dose
+        
         # Only proceed if auto controls are enabled
         if self.auto_nutrient:
             # EC control - dose nutrients if too low, notify if too high
-            if ec < self.ec_target - self.ec_tolerance:
-                self.dose('nutrient_a')
-                self.dose('nutrient_b')
-            elif ec > self.ec_target + self.ec_tolerance:
-                logger.warning(f"EC too high: {ec} mS/cm (target: {self.ec_target}±{self.ec_tolerance})")
+            if ec < self._ec_low:
+                dose('nutrient_a')
+                dose('nutrient_b')
+            elif ec > self._ec_high:
+                logger.warning("EC too high: %s mS/cm (target: %s±%s)", ec, self.ec_target, self.ec_tolerance)
                 self.socketio.emit('nutrient_warning', {
                     'type': 'ec_high',
                     'value': ec,
@@ -312,8 +470,8 @@ class NutrientController:
         # pH control - only if auto pH is enabled
         if self.auto_ph:
             # Adjust pH down if too high
-            if ph > self.ph_target + self.ph_tolerance:
-                self.dose('ph_down', min(5.0, (ph - self.ph_target) * 3.0))
+            if ph > self._ph_high:
+                dose('ph_down', min(5.0, (ph - self.ph_target) * 3.0))
 
     def update(self, sensor_data=None):
         """Update nutrient controller state"""
@@ -321,16 +479,28 @@ class NutrientController:
         if sensor_data is not None:
             self.check_and_adjust_levels(sensor_data)
 
+    def _update_thresholds(self):
+        """Recompute the EC/pH bounds used by check_and_adjust_levels"""
+        self._ec_low = self.ec_target - self.ec_tolerance
+        self._ec_high = self.ec_target + self.ec_tolerance
+        self._ph_high = self.ph_target + self.ph_tolerance
+
     def get_settings(self):
-        """Get current nutrient settings"""
-        return {
-            'ec_target': self.ec_target,
-            'ph_target': self.ph_target,
-            'ec_tolerance': self.ec_tolerance,
-            'ph_tolerance': self.ph_tolerance,
-            'auto_nutrient': self.auto_nutrient,
-            'auto_ph': self.auto_ph
-        }
+        """Get current nutrient settings
+        
+        The dict is cached until update_settings() changes something; treat it as read-only.
+        """
+        snapshot = self._settings_snapshot
+        if snapshot is None:
+            snapshot = self._settings_snapshot = {
+                'ec_target': self.ec_target,
+                'ph_target': self.ph_target,
+                'ec_tolerance': self.ec_tolerance,
+                'ph_tolerance': self.ph_tolerance,
+                'auto_nutrient': self.auto_nutrient,
+                'auto_ph': self.auto_ph
+            }
+        return snapshot
         
     def update_settings(self, settings):
         """Update nutrient controller settings"""
@@ -347,17 +517,21 @@ class NutrientController:
                 self.auto_nutrient = bool(settings['auto_nutrient'])
             if 'auto_ph' in settings:
                 self.auto_ph = bool(settings['auto_ph'])
+            self._settings_snapshot = None
+            self._update_thresholds()
             
             # Store settings in database
             try:
                 self.db.save_nutrient_settings(self.get_settings())
             except Exception as e:
-                logger.error(f"Failed to save nutrient settings to database: {e}")
+                logger.error("Failed to save nutrient settings to database: %s", e)
                 
-            logger.info(f"Nutrient settings updated: {self.get_settings()}")
+            logger.info("Nutrient settings updated: %s", self.get_settings())
             return True
         except Exception as e:
-            logger.error(f"Error updating nutrient settings: {e}")
+            self._settings_snapshot = None  # Some fields may have changed before the error
+            self._update_thresholds()
+            logger.error("Error updating nutrient settings: %s", e)
             return False
             
     def manual_control(self, pump_id, duration=5):
@@ -372,46 +546,56 @@ class NutrientController:
         """
         try:
             if pump_id not in self.pumps:
-                logger.error(f"Invalid pump ID: {pump_id}")
+                logger.error("Invalid pump ID: %s", pump_id)
                 return False
                 
             # Calculate amount based on duration and flow rate
-            amount_ml = duration * self.pumps[pump_id]['flow_rate_ml_per_sec']
+            amount_ml = duration * self.pumps[pump_id].flow_rate_ml_per_sec
             
             # Use the existing dose method
             return self.dose(pump_id, amount_ml)
         except Exception as e:
-            logger.error(f"Error in manual control: {e}")
+            logger.error("Error in manual control: %s", e)
             return False
     
     def reset_daily_totals(self):
         """Reset daily nutrient totals (called at midnight)"""
         logger.info("Resetting daily nutrient totals")
-        for pump_id in self.pumps:
-            self.pumps[pump_id]['daily_total_ml'] = 0.0
+        for pump in self.pumps.values():
+            pump.daily_total_ml = 0.0
         
         # Log the reset event
         try:
             self.db.log_system_event("nutrient_reset", "Daily nutrient totals reset")
         except Exception as e:
-            logger.error(f"Failed to log nutrient reset event: {e}")
+            logger.error("Failed to log nutrient reset event: %s", e)
     
     def abort_dosing(self):
         """Emergency stop for all dosing"""
-        with self.dosing_lock:
-            for pump_id in self.pumps:
-                self.pumps[pump_id]['state'] = False
-            
-            self.currently_dosing = False
-            self.active_pump = None
-            
-            # Notify clients
-            self.socketio.emit('dosing_aborted', {
-                'timestamp': time.time()
-            })
-            
-            logger.warning("Emergency abort of all nutrient dosing")
-            return True
+        # Drop pending status checks; they belong to the aborted doses
+        with self._pump_cv:
+            self._pump_events.clear()
+            self._pump_cv.notify()
+        
+        for pump in self.pumps.values():
+            pump.state = False
+            # Open the gate if a dose holds it
+            if pump.token is not None:
+                pump.token = None
+                try:
+                    pump.gate.release()
+                except RuntimeError:
+                    pass  # Released concurrently by the dose itself
+        
+        self._flush_dose_log()
+        
+        # Notify clients
+        self.socketio.emit('dosing_aborted', {
+            'timestamp': time.time()
+        })
+        
+        logger.warning("Emergency abort of all nutrient dosing")
+        return True
     
     def get_current_readings(self):
         """Get current pH and EC readings from sensors"""
@@ -419,9 +603,10 @@ class NutrientController:
             # FIXED: Handle case where sensor_manager is None
             if self.sensor_manager is None:
                 self.logger.warning("No sensor manager available, returning mock data")
+                rng = self._rng.random
                 return {
-                    'ph': 6.0 + (random.random() - 0.5) * 0.4,  # 5.8 - 6.2
-                    'ec': 1.2 + (random.random() - 0.5) * 0.4,  # 1.0 - 1.4
+                    'ph': 6.0 + (rng() - 0.5) * 0.4,  # 5.8 - 6.2
+                    'ec': 1.2 + (rng() - 0.5) * 0.4,  # 1.0 - 1.4
                     'connected': False
                 }
             
@@ -440,7 +625,7 @@ class NutrientController:
                     'connected': False
                 }
         except Exception as e:
-            self.logger.error(f"Error reading sensors: {e}")
+            self.logger.error("Error reading sensors: %s", e)
             return {
                 'ph': 6.0,
                 'ec': 1.2,
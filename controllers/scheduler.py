@@ -1,12 +1,117 @@
 # File: controllers/scheduler.py - Task scheduling system for vertical farm operations
 
 import time
+import collections
 import datetime
+import heapq
+import itertools
 import threading
 import logging
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from utils.http_pool import http_pool
 
 logger = logging.getLogger(__name__)
 
+class SensorReading(collections.namedtuple('SensorReading', 'temperature humidity co2 ph ec')):
+    """Readings from a sensor manager that returns a positional tuple
+    
+    Also answers the mapping-style reads controllers use on the dict form
+    (reading['co2'], reading.get('co2')), so it can stand in for that dict.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if type(key) is str:
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+
+# Seconds between sensor reads / controller updates
+CONTROLLER_UPDATE_INTERVAL = 3
+# Polling interval per plain controller, a little over the controller's own
+# throttle (light: check_interval of 30 s, watering: 5 s) so a call never lands
+# just inside it and gets skipped
+PLAIN_UPDATE_INTERVALS = {'light': 31, 'watering': 6}
+
+# A daily/weekly task registered up to this long after its time still runs that day
+# (the old polling loop fired anywhere in a 5-minute window)
+FIRST_RUN_GRACE_SECONDS = 300
+
+# Calendar tasks are re-checked against the wall clock at least this often, so a
+# clock step (NTP sync after boot, manual change) moves their run within a minute
+CALENDAR_RECHECK_SECONDS = 60
+
+
+def _next_hourly(now):
+    """Start of the next hour after now (epoch hours, like the old `time // 3600` check)"""
+    return (int(now) // 3600 + 1) * 3600
+
+
+def _next_daily(hour, minute, now, grace=0):
+    """Timestamp of the next hour:minute local time, allowing `grace` seconds of lateness"""
+    today = datetime.date.fromtimestamp(now)
+    at = datetime.time(hour, minute)
+    fire = datetime.datetime.combine(today, at).timestamp()
+    if fire + grace <= now:
+        fire = datetime.datetime.combine(today + datetime.timedelta(days=1), at).timestamp()
+    return fire
+
+
+def _next_weekly(day_of_week, hour, minute, now, grace=0):
+    """Timestamp of the next day_of_week (1=Monday) at hour:minute local time"""
+    today = datetime.date.fromtimestamp(now)
+    day = today + datetime.timedelta(days=(day_of_week - 1 - today.weekday()) % 7)
+    at = datetime.time(hour, minute)
+    fire = datetime.datetime.combine(day, at).timestamp()
+    if fire + grace <= now:
+        fire = datetime.datetime.combine(day + datetime.timedelta(days=7), at).timestamp()
+    return fire
+
+
+def _wall_deadline(fire_ts, now_ts, now_mono):
+    """Monotonic deadline at which to check a calendar task due at wall-clock fire_ts
+    
+    Capped at CALENDAR_RECHECK_SECONDS ahead: the conversion assumes the wall
+    clock keeps pace with the monotonic one, so it is redone on every check.
+    """
+    return now_mono + min(fire_ts - now_ts, CALENDAR_RECHECK_SECONDS)
+
+
+class TaskRecord:
+    """A scheduled task and its bookkeeping
+    
+    kind is 'hourly', 'daily', 'weekly', 'custom' or 'internal' (controller
+    ticks); recompute(now) returns the task's next fire time. For interval
+    tasks (monotonic=True) now and the result are time.monotonic() values,
+    for calendar tasks they are time.time() values and fire_ts holds the
+    wall-clock time of the next run.
+    """
+    __slots__ = ('id', 'kind', 'callback', 'recompute', 'monotonic', 'fire_ts', 'last_run', 'hour',
+                 'minute', 'day_of_week', 'last_run_day', 'last_run_week', 'interval')
+
+    def __init__(self, id, kind, callback, recompute, monotonic=False, last_run=0, hour=None,
+                 minute=None, day_of_week=None, last_run_day=0, last_run_week=0, interval=None):
+        self.id = id
+        self.kind = kind
+        self.callback = callback
+        self.recompute = recompute
+        self.monotonic = monotonic
+        self.fire_ts = None
+        self.last_run = last_run
+        self.hour = hour
+        self.minute = minute
+        self.day_of_week = day_of_week
+        self.last_run_day = last_run_day
+        self.last_run_week = last_run_week
+        self.interval = interval
+
+
 class Scheduler:
     """
     Manages scheduled tasks for all controllers in the vertical farm system.
@@ -20,6 +125,25 @@ class Scheduler:
         self.environment_controller = environment_controller
         self.watering_controller = watering_controller
         self.sensor_manager = sensor_manager  # Store sensor manager reference
+        # FIXED: Use the scheduler's sensor_manager directly instead of environment_controller's
+        if not sensor_manager:
+            self._get_sensor_data = self._read_no_sensor_data
+        
+        # Controllers updated on every controller tick (fixed for the scheduler's lifetime)
+        # Environment controller enabled for CO2 control (fan control remains manual)
+        self._sensor_controllers = tuple((controller, name) for controller, name in (
+            (environment_controller, 'environment'),
+            (nutrient_controller, 'nutrient')
+        ) if controller)
+        # Bound update methods, looked up once rather than on every tick
+        self._sensor_update_fns = tuple((controller.update, name) for controller, name in self._sensor_controllers)
+        # Without a sensor-driven controller nobody uses the readings, so skip the read
+        self._needs_sensor_data = bool(self._sensor_controllers)
+        # Controllers that don't need sensor data
+        self._plain_controllers = tuple((controller, name) for controller, name in (
+            (light_controller, 'light'),
+            (watering_controller, 'watering')
+        ) if controller)
         
         # Task schedule dictionaries
         self.hourly_tasks = []
@@ -32,6 +156,48 @@ class Scheduler:
         self.last_daily_check = 0
         self.last_weekly_check = 0
         
+        # Every task (plus the controller update ticks) sits in one heap keyed by
+        # its next fire time on the monotonic clock, so wall-clock steps cannot
+        # stall or bunch interval tasks; the loop sleeps until the earliest entry
+        # is due. Calendar tasks are converted from wall-clock time and re-checked
+        # against it (see _wall_deadline), so they follow clock steps.
+        # _wake_event interrupts that sleep when a task is added or on stop();
+        # _stop_event is only set by stop() and also cuts short the error backoff;
+        # it is checked before each task and controller update. _cancel is the
+        # same signal as a Future, so a blocking sensor read can be waited on
+        # together with it (see _read_sensor_manager).
+        self._heap = []
+        self._heap_lock = threading.Lock()
+        self._heap_seq = itertools.count()
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._cancel = Future()
+        self._sensor_future = None
+        # Sensor-driven controllers and plain controllers run on separate ticks:
+        # the former need fresh readings every few seconds, while the light and
+        # watering controllers throttle themselves and only need polling at their
+        # own rate. No sensor tick is scheduled when nothing consumes the readings.
+        self._sensor_tick_interval = CONTROLLER_UPDATE_INTERVAL
+        if self._needs_sensor_data:
+            self._push(time.monotonic(), TaskRecord(
+                id='sensor_update',
+                kind='internal',
+                callback=self._controller_tick,
+                recompute=lambda now: now + self._sensor_tick_interval,
+                monotonic=True
+            ))
+        self._plain_tick_intervals = {}
+        for controller, name in self._plain_controllers:
+            interval = PLAIN_UPDATE_INTERVALS.get(name, CONTROLLER_UPDATE_INTERVAL)
+            self._plain_tick_intervals[name] = interval
+            self._push(time.monotonic(), TaskRecord(
+                id=f'{name}_update',
+                kind='internal',
+                callback=lambda controller=controller, name=name: self._update_plain_controller(controller, name),
+                recompute=lambda now, interval=interval: now + interval,
+                monotonic=True
+            ))
+        
         # Initialize default tasks
         self._setup_default_tasks()
         
@@ -55,25 +221,44 @@ class Scheduler:
         # Only keep tasks that are actually needed for system operation
         pass
     
+    def _push(self, deadline, task):
+        """Queue task to fire at deadline (a time.monotonic() value) and wake the loop so it can sleep less if needed"""
+        with self._heap_lock:
+            heapq.heappush(self._heap, (deadline, next(self._heap_seq), task))
+        self._wake_event.set()
+    
+    def _push_wall(self, fire_ts, task):
+        """Queue task to fire at wall-clock time fire_ts"""
+        task.fire_ts = fire_ts
+        self._push(_wall_deadline(fire_ts, time.time(), time.monotonic()), task)
+    
     def add_hourly_task(self, task_id, callback):
         """Add a task to run every hour"""
-        self.hourly_tasks.append({
-            'id': task_id,
-            'callback': callback,
-            'last_run': 0
-        })
+        task = TaskRecord(
+            id=task_id,
+            kind='hourly',
+            callback=callback,
+            last_run=0,
+            recompute=_next_hourly
+        )
+        self.hourly_tasks.append(task)
+        self._push_wall(time.time(), task)  # First run straight away, then on each hour
         logger.debug(f"Added hourly task: {task_id}")
     
     def add_daily_task(self, task_id, callback, time_str):
         """Add a task to run once per day at the specified time"""
         hour, minute = map(int, time_str.split(':'))
-        self.daily_tasks.append({
-            'id': task_id,
-            'callback': callback,
-            'hour': hour,
-            'minute': minute,
-            'last_run_day': 0
-        })
+        task = TaskRecord(
+            id=task_id,
+            kind='daily',
+            callback=callback,
+            hour=hour,
+            minute=minute,
+            last_run_day=0,
+            recompute=lambda now: _next_daily(hour, minute, now)
+        )
+        self.daily_tasks.append(task)
+        self._push_wall(_next_daily(hour, minute, time.time(), FIRST_RUN_GRACE_SECONDS), task)
         logger.debug(f"Added daily task: {task_id} at {time_str}")
     
     def add_weekly_task(self, task_id, callback, day_of_week, time_str):
@@ -81,175 +266,246 @@ class Scheduler:
         day_of_week: 1-7, where 1 is Monday and 7 is Sunday
         """
         hour, minute = map(int, time_str.split(':'))
-        self.weekly_tasks.append({
-            'id': task_id,
-            'callback': callback,
-            'day_of_week': day_of_week,
-            'hour': hour,
-            'minute': minute,
-            'last_run_week': 0
-        })
+        task = TaskRecord(
+            id=task_id,
+            kind='weekly',
+            callback=callback,
+            day_of_week=day_of_week,
+            hour=hour,
+            minute=minute,
+            last_run_week=0,
+            recompute=lambda now: _next_weekly(day_of_week, hour, minute, now)
+        )
+        self.weekly_tasks.append(task)
+        self._push_wall(_next_weekly(day_of_week, hour, minute, time.time(), FIRST_RUN_GRACE_SECONDS), task)
         logger.debug(f"Added weekly task: {task_id} on day {day_of_week} at {time_str}")
     
     def add_custom_task(self, task_id, callback, interval_seconds, start_delay=0):
-        """Add a task to run at a custom interval specified in seconds"""
-        self.custom_tasks.append({
-            'id': task_id,
-            'callback': callback,
-            'interval': interval_seconds,
-            'last_run': time.time() - interval_seconds + start_delay
-        })
+        """Add a task to run at a custom interval specified in seconds
+        
+        interval_seconds and start_delay are measured on the monotonic clock, so
+        wall-clock adjustments neither delay nor bunch up runs; last_run is a
+        time.monotonic() value.
+        """
+        now = time.monotonic()
+        task = TaskRecord(
+            id=task_id,
+            kind='custom',
+            callback=callback,
+            interval=interval_seconds,
+            last_run=now - interval_seconds + start_delay,
+            recompute=lambda now: now + interval_seconds,
+            monotonic=True
+        )
+        self.custom_tasks.append(task)
+        self._push(now + start_delay, task)
         logger.debug(f"Added custom task: {task_id} with interval {interval_seconds}s")
     
-    def check_scheduled_tasks(self):
-        """Check if any scheduled tasks need to be run"""
-        current_time = time.time()
-        now = datetime.datetime.now()
-        current_day = now.day
-        current_weekday = now.weekday() + 1  # Convert to 1-7 format (Monday-Sunday)
-        current_hour = now.hour
-        current_minute = now.minute
-        current_week = now.isocalendar()[1]  # ISO week number
-        
-        # Check hourly tasks
-        current_hour_timestamp = current_time // 3600
-        if current_hour_timestamp > self.last_hourly_check:
-            self.last_hourly_check = current_hour_timestamp
-            for task in self.hourly_tasks:
-                if current_hour_timestamp > task['last_run']:
-                    try:
-                        logger.info(f"Running hourly task: {task['id']}")
-                        task['callback']()
-                        task['last_run'] = current_hour_timestamp
-                    except Exception as e:
-                        logger.error(f"Error running hourly task {task['id']}: {str(e)}")
+    def check_scheduled_tasks(self, now_ts=None, now_lt=None, now_mono=None):
+        """Run every task whose deadline is at or before now_mono
         
-        # Check daily tasks
-        for task in self.daily_tasks:
-            if (current_day != task['last_run_day'] and 
-                current_hour == task['hour'] and 
-                current_minute >= task['minute'] and 
-                current_minute < task['minute'] + 5):  # 5-minute window to avoid missing tasks
-                try:
-                    logger.info(f"Running daily task: {task['id']}")
-                    task['callback']()
-                    task['last_run_day'] = current_day
-                except Exception as e:
-                    logger.error(f"Error running daily task {task['id']}: {str(e)}")
-        
-        # Check weekly tasks
-        for task in self.weekly_tasks:
-            if (current_week != task['last_run_week'] and 
-                current_weekday == task['day_of_week'] and
-                current_hour == task['hour'] and 
-                current_minute >= task['minute'] and 
-                current_minute < task['minute'] + 5):  # 5-minute window
-                try:
-                    logger.info(f"Running weekly task: {task['id']}")
-                    task['callback']()
-                    task['last_run_week'] = current_week
-                except Exception as e:
-                    logger.error(f"Error running weekly task {task['id']}: {str(e)}")
+        Args:
+            now_ts (float): Current time.time(); sampled here if not given
+            now_lt (time.struct_time): time.localtime(now_ts); derived if not given
+            now_mono (float): time.monotonic() taken with now_ts; sampled here if not given
+            
+        Returns:
+            float: Seconds until the next task is due, or None if nothing is scheduled
+        """
+        if now_ts is None:
+            now_ts = time.time()
+            now_mono = time.monotonic()
+        elif now_mono is None:
+            now_mono = time.monotonic()
+        if now_lt is None:
+            now_lt = time.localtime(now_ts)
+        now = now_ts
         
-        # Check custom interval tasks
-        for task in self.custom_tasks:
-            if current_time - task['last_run'] >= task['interval']:
-                try:
-                    logger.info(f"Running custom task: {task['id']}")
-                    task['callback']()
-                    task['last_run'] = current_time
-                except Exception as e:
-                    logger.error(f"Error running custom task {task['id']}: {str(e)}")
+        _monotonic = time.monotonic
+        log_info = logger.info
+        log_error = logger.error
+        heap = self._heap
+        heap_lock = self._heap_lock
+        stopping = self._stop_event.is_set
+        while True:
+            if stopping():
+                return None
+            with heap_lock:
+                if not heap:
+                    return None
+                if heap[0][0] > now_mono:
+                    # Tasks may have taken a while, so measure the wait from the real clock
+                    return heap[0][0] - _monotonic()
+                _, _, task = heapq.heappop(heap)
+                if not task.monotonic and now < task.fire_ts:
+                    # Not due by the wall clock: a periodic re-check, or the clock was stepped back
+                    heapq.heappush(heap, (_wall_deadline(task.fire_ts, now, now_mono), next(self._heap_seq), task))
+                    continue
+            
+            kind = task.kind
+            try:
+                if kind != 'internal':
+                    log_info("Running %s task: %s", kind, task.id)
+                task.callback()
+                if kind == 'hourly':
+                    task.last_run = int(now) // 3600  # Integer hour bucket, as in _next_hourly
+                    self.last_hourly_check = task.last_run
+                elif kind == 'daily':
+                    task.last_run_day = now_lt.tm_mday
+                elif kind == 'weekly':
+                    # ISO week number from the day of year and weekday (Monday = 0)
+                    task.last_run_week = (now_lt.tm_yday - now_lt.tm_wday + 9) // 7
+                elif kind == 'custom':
+                    task.last_run = now_mono
+            except Exception as e:
+                log_error("Error running %s task %s: %s", kind, task.id, e)
+            
+            with heap_lock:
+                if task.monotonic:
+                    deadline = task.recompute(now_mono)
+                else:
+                    # Calendar tasks are computed on the wall clock; keep the heap monotonic
+                    task.fire_ts = task.recompute(now)
+                    deadline = _wall_deadline(task.fire_ts, now, now_mono)
+                heapq.heappush(heap, (deadline, next(self._heap_seq), task))
     
     def _run(self):
-        """Main scheduler loop"""
+        """Main scheduler loop: run what is due, then sleep until the next fire time
+        
+        This stays a plain thread rather than an asyncio task: the app runs
+        Flask-SocketIO in threading mode and every controller update and sensor
+        read blocks, so an event loop would only hand the same calls to executor
+        threads. Between fire times the thread is parked in Event.wait().
+        """
+        _time = time.time
+        _monotonic = time.monotonic
+        _localtime = time.localtime
+        log_error = logger.error
+        wake_event = self._wake_event
+        check = self.check_scheduled_tasks
         while self.running:
             try:
-                # Get sensor readings as dictionary
-                sensor_data = self._get_sensor_data()
-                
-                # Update all controllers with sensor data
-                self._update_controllers(sensor_data)
-                
-                # Check scheduled tasks
-                self.check_scheduled_tasks()
-                
-                # Sleep for a shorter interval for faster response
-                time.sleep(3)  # Reduced from 5 to 3 seconds
+                # Clear before looking at the heap so a task added meanwhile still wakes us
+                wake_event.clear()
+                now_mono = _monotonic()
+                now_ts = _time()
+                now_lt = _localtime(now_ts)
+                timeout = check(now_ts, now_lt, now_mono)
+                if self.running:
+                    wake_event.wait(timeout)
                 
             except Exception as e:
-                logger.error(f"Error in scheduler loop: {str(e)}")
-                time.sleep(5)
+                log_error("Error in scheduler loop: %s", e)
+                if self._stop_event.wait(5):
+                    break
+
+    def _controller_tick(self):
+        """Read sensors and update the sensor-driven controllers (every CONTROLLER_UPDATE_INTERVAL seconds)"""
+        self._update_controllers(self._get_sensor_data())
 
     def _get_sensor_data(self):
-        """Get sensor data and convert to consistent dictionary format"""
+        """Get sensor data and convert to consistent dictionary format
+        
+        The sensor manager always returns the same shape, so the first non-empty
+        reading replaces this method on the instance with the reader for that
+        shape and later ticks skip the type check.
+        """
         try:
-            # FIXED: Use the scheduler's sensor_manager directly instead of environment_controller's
-            if self.sensor_manager:
-                raw_data = self.sensor_manager.read_all_sensors()
-                
-                # Convert tuple to dictionary if needed
-                if isinstance(raw_data, tuple):
-                    return {
-                        'temperature': raw_data[0] if len(raw_data) > 0 else None,
-                        'humidity': raw_data[1] if len(raw_data) > 1 else None,
-                        'co2': raw_data[2] if len(raw_data) > 2 else None,
-                        'ph': raw_data[3] if len(raw_data) > 3 else None,
-                        'ec': raw_data[4] if len(raw_data) > 4 else None
-                    }
-                return raw_data if raw_data else {}
-            else:
-                # FIXED: Return empty dict if no sensor manager available
-                logger.debug("No sensor manager available for scheduler")
-                return {}
-            
+            raw_data = self._read_sensor_manager()
         except Exception as e:
             logger.error(f"Error reading sensors for controller updates: {str(e)}")
             # FIXED: Return empty dict instead of None to prevent controller errors
             return {}
+        
+        if isinstance(raw_data, tuple):
+            self._get_sensor_data = self._read_tuple_sensor_data
+            return self._wrap_sensor_tuple(raw_data)
+        if raw_data:
+            self._get_sensor_data = self._read_dict_sensor_data
+            return raw_data
+        return {}
+
+    @staticmethod
+    def _wrap_sensor_tuple(raw_data):
+        """Wrap a positional tuple so controllers can read it by name"""
+        return SensorReading._make(raw_data[:5] + (None,) * (5 - len(raw_data)))
+
+    def _read_tuple_sensor_data(self):
+        """_get_sensor_data for a sensor manager that returns positional tuples"""
+        try:
+            raw_data = self._read_sensor_manager()
+            return self._wrap_sensor_tuple(raw_data) if raw_data else {}
+        except Exception as e:
+            logger.error(f"Error reading sensors for controller updates: {str(e)}")
+            return {}
+
+    def _read_dict_sensor_data(self):
+        """_get_sensor_data for a sensor manager that returns dicts"""
+        try:
+            return self._read_sensor_manager() or {}
+        except Exception as e:
+            logger.error(f"Error reading sensors for controller updates: {str(e)}")
+            return {}
+
+    def _read_sensor_manager(self):
+        """Run sensor_manager.read_all_sensors() on the shared HTTP pool and wait for it
+        
+        The wait ends as soon as stop() is called, so a slow read cannot hold up
+        shutdown; None is returned in that case. A read left in flight by such a
+        wait is picked up again rather than queueing another one behind it.
+        """
+        future = self._sensor_future
+        if future is None or future.done():
+            future = self._sensor_future = http_pool.submit(self.sensor_manager.read_all_sensors)
+        done, _ = wait((future, self._cancel), return_when=FIRST_COMPLETED)
+        if future not in done:
+            return None
+        self._sensor_future = None
+        return future.result()
+
+    def _read_no_sensor_data(self):
+        """_get_sensor_data when the scheduler has no sensor manager"""
+        # FIXED: Return empty dict if no sensor manager available
+        logger.debug("No sensor manager available for scheduler")
+        return {}
 
     def _update_controllers(self, sensor_data=None):
-        """Update all controllers with current sensor data"""
+        """Update the sensor-driven controllers with current sensor data"""
+        if not sensor_data:
+            return
+        debug_on = logger.isEnabledFor(logging.DEBUG)
+        log_warning = logger.warning
+        stopping = self._stop_event.is_set
+        for update, name in self._sensor_update_fns:
+            if stopping():
+                return
+            try:
+                update(sensor_data)
+                if debug_on:
+                    logger.debug("Updated %s controller with sensor data", name)
+            except Exception as e:
+                log_warning("Error updating %s controller: %s", name, e)
+
+    def _update_plain_controller(self, controller, name):
+        """Update a controller that doesn't need sensor data (on its own PLAIN_UPDATE_INTERVALS tick)"""
+        if self._stop_event.is_set():
+            return
         try:
-            # Environment controller enabled for CO2 control (fan control remains manual)
-            controllers_with_sensors = [
-                (self.environment_controller, 'environment'),  # ENABLED for CO2 control
-                (self.nutrient_controller, 'nutrient')
-            ]
-            
-            # Controllers that don't need sensor data
-            controllers_without_sensors = [
-                (self.light_controller, 'light'),
-                (self.watering_controller, 'watering')
-            ]
-            
-            # Update controllers that use sensor data
-            for controller, name in controllers_with_sensors:
-                if controller and sensor_data:
-                    try:
-                        controller.update(sensor_data)
-                        logger.debug(f"Updated {name} controller with sensor data")
-                    except Exception as e:
-                        logger.warning(f"Error updating {name} controller: {str(e)}")
-            
-            # Update controllers that don't need sensor data
-            for controller, name in controllers_without_sensors:
-                if controller:
-                    try:
-                        controller.update()
-                        logger.debug(f"Updated {name} controller")
-                    except Exception as e:
-                        logger.warning(f"Error updating {name} controller: {str(e)}")
-                        
+            controller.update()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Updated %s controller", name)
         except Exception as e:
-            logger.error(f"Error in controller update process: {str(e)}")
+            logger.warning("Error updating %s controller: %s", name, e)
     
     # ADD: Missing start() method that app.py expects
     def start(self):
         """Start the scheduler thread"""
         if not self.running:
+            self._stop_event.clear()
+            if self._cancel.done():
+                self._cancel = Future()
             self.running = True
-            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
             self.thread.start()
             logger.info("Scheduler thread started")
             return True
@@ -261,6 +517,10 @@ class Scheduler:
         if self.running:
             logger.info("Stopping scheduler...")
             self.running = False
+            self._stop_event.set()
+            if not self._cancel.done():
+                self._cancel.set_result(None)
+            self._wake_event.set()
             
             # FIXED: Use shorter timeout and don't block on thread join
             if self.thread and self.thread.is_alive():
@@ -4,13 +4,23 @@ import datetime
 import time
 import random  # Used for simulation when Arduino not available
 import logging
+import threading
 import requests  # Added for HTTP requests to Arduino API
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-import socket
+
+from utils import fast_json
+from utils.http_pool import http_pool
 
 logger = logging.getLogger(__name__)
 
+# Keep-alive connections kept open to the Arduino; matches the shared HTTP pool's
+# worker count so concurrent requests from it never queue for a connection
+SENSOR_POOL_MAXSIZE = 4
+
+# Sensors whose values come from the Arduino's /api/sensors payload
+ARDUINO_SENSOR_IDS = ('temperature', 'ph', 'ec', 'humidity', 'co2')
+
 class SensorManager:
     def __init__(self, arduino_ip="192.168.1.107", arduino_port=80, connection_timeout=5, read_timeout=10, max_retries=3):
         # Configuration for Arduino WiFi API - default IP set to 192.168.1.107
@@ -38,55 +48,46 @@ class SensorManager:
         # Setup retry strategy for requests
         self.session = self._create_robust_session()
         
-        # Atlas Scientific sensor configurations
-        self.sensors = {
+        # Atlas Scientific sensor configurations (static metadata)
+        self._meta = {
             'ph': {
                 'type': 'atlas_scientific',
                 'address': 99,  # I2C address
                 'interface': 'i2c',
-                'name': 'pH Sensor',
-                'enabled': True,
-                'last_reading': 0,
-                'last_reading_time': 0
+                'name': 'pH Sensor'
             },
             'ec': {
                 'type': 'atlas_scientific',
                 'address': 100,  # I2C address
                 'interface': 'i2c',
-                'name': 'EC Sensor',
-                'enabled': True,
-                'last_reading': 0,
-                'last_reading_time': 0
+                'name': 'EC Sensor'
             },
             'temperature': {
                 'type': 'atlas_scientific',
                 'address': 102,  # I2C address
                 'interface': 'i2c',
-                'name': 'Temperature Sensor',
-                'enabled': True,
-                'last_reading': 0,
-                'last_reading_time': 0
+                'name': 'Temperature Sensor'
             },
             'humidity': {
                 'type': 'atlas_scientific',  # Changed from dht22 to atlas_scientific
                 'address': 111,  # EZO-HUM I2C address
                 'interface': 'i2c',  # Changed from pin to i2c interface
-                'name': 'EZO-HUM Humidity Sensor',
-                'enabled': True,
-                'last_reading': 0,
-                'last_reading_time': 0
+                'name': 'EZO-HUM Humidity Sensor'
             },
             'co2': {
                 'type': 'atlas_scientific',  # Changed from mh_z19 to atlas_scientific
                 'address': 105,  # I2C address for CO2 sensor
                 'interface': 'i2c',  # Changed from uart to i2c
-                'name': 'CO2 Sensor',
-                'enabled': True,
-                'last_reading': 0,
-                'last_reading_time': 0
+                'name': 'CO2 Sensor'
             }
         }
         
+        # Per-sensor state kept as parallel dicts keyed by sensor id, so the hot
+        # paths do one lookup per value; self.sensors rebuilds the old combined view
+        self._enabled = dict.fromkeys(self._meta, True)
+        self._readings = dict.fromkeys(self._meta, 0)
+        self._read_times = dict.fromkeys(self._meta, 0)
+        
         # Store device states separately
         self.devices = {
             'fans': {'state': False},
@@ -97,9 +98,19 @@ class SensorManager:
         
         # Store last successful sensor readings to use as fallback
         self.last_successful_readings = {}
+        # Snapshot from the latest background fetch, served while that fetch succeeded
+        self._latest_readings = {}
+        self._last_fetch_ok = False
         
         # Maximum age of readings before considering them stale (in seconds)
         self.max_reading_age = 60
+        # Per-sensor overrides of max_reading_age, e.g. {'ph': 300} for slow-moving values
+        self.max_reading_ages = {}
+        
+        # Seconds between background fetches; read_sensor and read_all_sensors only serve the cache
+        self.poll_interval = 5
+        self._stop_event = threading.Event()
+        self._refresh_thread = None
         
         # Log the Arduino IP we're using
         logger.info(f"Initializing SensorManager with Arduino IP: {self.arduino_ip}")
@@ -107,11 +118,13 @@ class SensorManager:
         # Test Arduino connection if URL is provided
         if self.arduino_api_url:
             self._test_arduino_connection()
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, name='sensor_refresh', daemon=True)
+            self._refresh_thread.start()
         else:
             logger.info("No Arduino IP configured, running in simulation mode")
     
     def _create_robust_session(self):
-        """Create a requests session with retry capabilities"""
+        """Create a keep-alive requests session with retry capabilities"""
         session = requests.Session()
         
         # Configure retry strategy
@@ -122,9 +135,15 @@ class SensorManager:
             allowed_methods=["GET", "POST"]
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # One host, so one pool; its connections are reused across requests
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=SENSOR_POOL_MAXSIZE,
+            max_retries=retry_strategy
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
+        session.headers.update({'Connection': 'keep-alive'})
         
         return session
     
@@ -156,25 +175,6 @@ class SensorManager:
             reset_time = datetime.datetime.fromtimestamp(self.circuit_breaker_open_until)
             logger.warning(f"Circuit breaker opened until {reset_time.strftime('%a %b %d %H:%M:%S %Y')}")
     
-    def _is_host_reachable(self):
-        """Check if the host is reachable using a simple socket connection"""
-        # Check if circuit breaker is open
-        if self._is_circuit_breaker_open():
-            return False
-            
-        if not self.arduino_ip:
-            return False
-            
-        try:
-            # Try to establish a socket connection to check if host is reachable
-            with socket.create_connection((self.arduino_ip, self.arduino_port), timeout=2) as sock:
-                return True
-        except (socket.timeout, socket.error, ConnectionRefusedError):
-            return False
-        except Exception as e:
-            logger.error(f"Unexpected error checking host reachability: {e}")
-            return False
-    
     def _test_arduino_connection(self):
         """Test connection to Arduino API with improved error handling"""
         # Check if circuit breaker is open
@@ -189,16 +189,8 @@ class SensorManager:
             
         self.last_connection_attempt = current_time
         
-        # First check if the host is even reachable
-        if not self._is_host_reachable():
-            if self.connected:  # Only log if state changes
-                logger.warning(f"Arduino host {self.arduino_ip} is not reachable")
-                self.connected = False
-            
-            # Record connection failure for circuit breaker
-            self._record_connection_failure()
-            return False
-            
+        # No separate socket probe: an unreachable host fails the GET within the
+        # same connect timeout and is handled below
         try:
             # Use the known correct endpoint and IP
             logger.debug(f"Testing connection to Arduino API at {self.arduino_ip}")
@@ -272,16 +264,9 @@ class SensorManager:
             # Use explicit IP to ensure consistency
             url = f"http://192.168.1.107/api/sensors"
             
-            # Try a very basic socket connection before doing a full HTTP request
-            try:
-                with socket.create_connection((self.arduino_ip, self.arduino_port), timeout=1) as sock:
-                    logger.info(f"Socket connection to Arduino at {self.arduino_ip}:{self.arduino_port} successful")
-            except Exception as socket_err:
-                logger.error(f"Socket connection to Arduino failed: {socket_err}")
-                self._record_connection_failure()
-                return False
-            
-            logger.info(f"Fetching sensor data from Arduino: {url}")
+            debug_on = logger.isEnabledFor(logging.DEBUG)
+            if debug_on:
+                logger.debug("Fetching sensor data from Arduino: %s", url)
             fetch_start = time.time()
             
             response = self.session.get(
@@ -290,48 +275,36 @@ class SensorManager:
             )
             
             fetch_time = time.time() - fetch_start
-            logger.info(f"Arduino API fetch completed in {fetch_time*1000:.0f}ms with status {response.status_code}")
+            # The one INFO line per poll; everything else below is DEBUG
+            logger.info("Arduino API fetch completed in %.0fms with status %s", fetch_time * 1000, response.status_code)
             
             if response.status_code == 200:
-                # Log the raw response
-                raw_response = response.text
-                logger.info(f"Raw Arduino response ({len(raw_response)} bytes): {raw_response[:100]}")
+                # Log the raw response (only decoded to text when it will be shown)
+                if debug_on:
+                    logger.debug("Raw Arduino response (%d bytes): %s", len(response.content), response.text[:100])
                 
                 try:
-                    data = response.json()
-                    logger.info(f"Arduino data parsed successfully: {data}")
-                    
-                    # Log raw values from JSON
-                    logger.info(f"Raw temperature value: {data.get('temperature')}")
-                    logger.info(f"Raw humidity value: {data.get('humidity')}")
-                    logger.info(f"Raw CO2 value: {data.get('co2')}")
+                    data = fast_json.loads(response.content)
+                    if debug_on:
+                        logger.debug("Arduino data parsed successfully: %s", data)
+                        
+                        # Log raw values from JSON
+                        logger.debug("Raw temperature value: %s", data.get('temperature'))
+                        logger.debug("Raw humidity value: %s", data.get('humidity'))
+                        logger.debug("Raw CO2 value: %s", data.get('co2'))
                     
                     # Process the sensor data with explicit null handling
                     now = time.time()
                     
                     # Handle all sensors consistently with minimal processing
-                    # Just directly set the values from JSON, handle None values
-                    if 'temperature' in data and data['temperature'] is not None:
-                        self.sensors['temperature']['last_reading'] = float(data['temperature'])
-                        self.sensors['temperature']['last_reading_time'] = now
-                    
-                    if 'ph' in data and data['ph'] is not None:
-                        self.sensors['ph']['last_reading'] = float(data['ph'])
-                        self.sensors['ph']['last_reading_time'] = now
-                    
-                    if 'ec' in data and data['ec'] is not None:
-                        self.sensors['ec']['last_reading'] = float(data['ec'])
-                        self.sensors['ec']['last_reading_time'] = now
-                    
-                    # Direct humidity processing without special handling or sanity checks
-                    if 'humidity' in data and data['humidity'] is not None:
-                        self.sensors['humidity']['last_reading'] = float(data['humidity'])
-                        self.sensors['humidity']['last_reading_time'] = now
-                        logger.info(f"Set humidity value: {self.sensors['humidity']['last_reading']}")
-                    
-                    if 'co2' in data and data['co2'] is not None:
-                        self.sensors['co2']['last_reading'] = float(data['co2'])
-                        self.sensors['co2']['last_reading_time'] = now
+                    # Just directly set the values from JSON, skipping None values
+                    readings = self._readings
+                    read_times = self._read_times
+                    for sensor_id in ARDUINO_SENSOR_IDS:
+                        value = data.get(sensor_id)
+                        if value is not None:
+                            readings[sensor_id] = float(value)
+                            read_times[sensor_id] = now
                     
                     # Update device states if available
                     if 'devices' in data:
@@ -355,23 +328,56 @@ class SensorManager:
             self.connected = False
             return False
 
+    @property
+    def sensors(self):
+        """Combined per-sensor view (metadata, enabled, last_reading, last_reading_time)
+        
+        Built on each access for callers that expect the old dict-of-dicts
+        layout; it is a snapshot, so change state through _enabled and friends.
+        """
+        return {
+            sensor_id: {
+                **meta,
+                'enabled': self._enabled[sensor_id],
+                'last_reading': self._readings[sensor_id],
+                'last_reading_time': self._read_times[sensor_id]
+            }
+            for sensor_id, meta in self._meta.items()
+        }
+
+    def _refresh_loop(self):
+        """Fetch from the Arduino every poll_interval seconds until stop()"""
+        while not self._stop_event.is_set():
+            fetch_start = time.time()
+            try:
+                ok = self._fetch_sensor_data_from_arduino()
+                if ok:
+                    self._publish_readings(fetch_start)
+            except Exception as e:
+                logger.error(f"Error in sensor refresh loop: {e}")
+                ok = False
+            self._last_fetch_ok = ok
+            self._stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop_event.set()
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            self._refresh_thread.join(timeout=1.0)
+
     def read_sensor(self, sensor_id):
-        """Read a specific sensor and return the value"""
-        if sensor_id not in self.sensors or not self.sensors[sensor_id]['enabled']:
+        """Return a sensor's cached value, or None if it is older than its max reading age"""
+        if not self._enabled.get(sensor_id):
             return None
         
-        config = self.sensors[sensor_id]
-        current_time = time.time()
+        age = time.time() - self._read_times[sensor_id]
+        max_age = self.max_reading_ages.get(sensor_id, self.max_reading_age)
         
-        # For Arduino-based sensors, check if we need to fetch new data
-        if sensor_id in ['ph', 'ec', 'temperature', 'humidity', 'co2']:
-            # If data is old or we don't have a reading yet
-            if self.arduino_api_url and (current_time - config['last_reading_time'] > 5):
-                self._fetch_sensor_data_from_arduino()
-            
+        # Arduino-based sensors are kept fresh by _refresh_loop
+        if sensor_id in ARDUINO_SENSOR_IDS:
             # If we have a recent reading, return it
-            if current_time - config['last_reading_time'] < self.max_reading_age:
-                return config['last_reading']
+            if age < max_age:
+                return self._readings[sensor_id]
             else:
                 return None  # Return None instead of simulating data
         
@@ -379,65 +385,62 @@ class SensorManager:
         # If Arduino not connected, return None instead of simulating
         if self.arduino_api_url and self.connected:
             # Try to use last reading if recent
-            if current_time - config['last_reading_time'] < self.max_reading_age:
-                return config['last_reading']
+            if age < max_age:
+                return self._readings[sensor_id]
             else:
                 return None  # Return None if we don't have recent data
         else:
             return None  # Return None instead of simulating
 
     def read_all_sensors(self):
-        """Read all enabled sensors with improved reliability and caching"""
-        start_time = time.time()
-        
-        # If circuit breaker is open, use cached data
-        if self._is_circuit_breaker_open() and self.last_successful_readings:
-            logger.debug("Using cached sensor readings due to open circuit breaker")
-            readings = self.last_successful_readings.copy()
-            readings['timestamp'] = time.time()
-            readings['cached'] = True
-            return readings
-        
-        # Always try to fetch fresh data from Arduino first
-        fetch_success = False
-        if self.arduino_api_url:
-            fetch_success = self._fetch_sensor_data_from_arduino()
+        """Return the readings from the latest background fetch
         
-        # If Arduino fetch was successful, build readings from updated sensor values
-        if fetch_success:
-            readings = {}
-            current_time = time.time()
-            
-            # Include all sensor readings that are recent enough
-            for sensor_id, config in self.sensors.items():
-                if config['enabled'] and current_time - config['last_reading_time'] < self.max_reading_age:
-                    readings[sensor_id] = config['last_reading']
-            
-            # Add device states if available
-            if self.devices:
-                readings['devices'] = self.devices
-            
-            # Add timestamp
-            readings['timestamp'] = current_time
-            readings['fetch_time_ms'] = int((time.time() - start_time) * 1000)
-            
-            # Cache these successful readings
-            if readings and len(readings) > 1:  # More than just the timestamp
-                self.last_successful_readings = readings.copy()
-                
-            return readings
+        Served from the snapshot _refresh_loop publishes, so callers never hit the
+        Arduino themselves. If the latest fetch failed (or the circuit breaker is
+        open), the last successful readings are returned flagged as cached.
+        """
+        if self._last_fetch_ok:
+            return dict(self._latest_readings)
         
         # If fetching failed but we have cached data, use it
-        elif self.last_successful_readings:
+        if self.last_successful_readings:
             logger.warning("Failed to fetch new data, using cached sensor readings")
-            readings = self.last_successful_readings.copy()
-            readings['timestamp'] = time.time()
-            readings['cached'] = True
-            return readings
+            return self._cached_readings()
         
         # If all else fails, return empty dict (no data available)
         return {}
 
+    def _publish_readings(self, start_time):
+        """Build the read_all_sensors snapshot from the values a successful fetch stored"""
+        readings = {}
+        current_time = time.time()
+        
+        # Include all sensor readings that are recent enough
+        max_ages = self.max_reading_ages
+        max_age = self.max_reading_age
+        sensor_readings = self._readings
+        read_times = self._read_times
+        for sensor_id, enabled in self._enabled.items():
+            if enabled and current_time - read_times[sensor_id] < max_ages.get(sensor_id, max_age):
+                readings[sensor_id] = sensor_readings[sensor_id]
+        
+        # Add device states if available
+        if self.devices:
+            readings['devices'] = self.devices
+        
+        # Add timestamp
+        readings['timestamp'] = current_time
+        readings['fetch_time_ms'] = int((time.time() - start_time) * 1000)
+        
+        self._latest_readings = readings
+        # Cache these successful readings
+        if len(readings) > 1:  # More than just the timestamp
+            self.last_successful_readings = readings
+
+    def _cached_readings(self):
+        """Last successful readings, restamped and flagged as cached, in a single copy"""
+        return {**self.last_successful_readings, 'timestamp': time.time(), 'cached': True}
+
     def control_pump(self, pump_id, state, duration=0):
         """Control Atlas Scientific peristaltic pump via Arduino API"""
         if not self.arduino_api_url:
@@ -462,7 +465,7 @@ class SensorManager:
             )
             
             if response.status_code == 200:
-                result = response.json()
+                result = fast_json.loads(response.content)
                 return result.get('success', False)
             else:
                 logger.error(f"Pump control failed: HTTP {response.status_code}")
@@ -479,3 +482,24 @@ class SensorManager:
             logger.error(f"Unexpected error controlling pump: {e}")
             self.connected = False
             return False
+
+    def read_all_sensors_async(self):
+        """Schedule read_all_sensors on the shared HTTP pool; returns a Future of the readings"""
+        return http_pool.submit(self.read_all_sensors)
+
+    def control_pump_async(self, pump_id, state, duration=0):
+        """Schedule control_pump on the shared HTTP pool; returns a Future of its result"""
+        return http_pool.submit(self.control_pump, pump_id, state, duration)
+
+    def control_pumps(self, commands):
+        """Send several pump commands at once and wait for all of them
+        
+        Args:
+            commands: Iterable of (pump_id, state) or (pump_id, state, duration) tuples
+            
+        Returns:
+            list: control_pump result for each command, in order
+        """
+        # The shared pool's worker count bounds how many requests hit the Arduino at once
+        futures = [self.control_pump_async(*command) for command in commands]
+        return [future.result() for future in futures]
@@ -898,15 +898,15 @@ class WateringController:
             
             # Method 1: Try to use relay_controller directly (most reliable)
             try:
-                if self.relay_controller and hasattr(self.relay_controller, 'set_relay'):
+                if self.relay_controller and hasattr(self.relay_controller, 'set_relay_sync'):
                     logger.info(f"Setting water pump relay (channel {self.water_pump_relay_channel}) to {'ON' if state else 'OFF'} using relay_controller")
-                    success = self.relay_controller.set_relay(self.water_pump_relay_channel, state)
+                    success = self.relay_controller.set_relay_sync(self.water_pump_relay_channel, state)
                     if success:
                         logger.info(f"Successfully set pump state using relay_controller")
                     else:
                         logger.warning("relay_controller.set_relay returned False")
                 else:
-                    logger.warning("relay_controller not available or missing set_relay method")
+                    logger.warning("relay_controller not available or missing set_relay_sync method")
             except Exception as e:
                 logger.warning(f"Could not use relay_controller: {e}")
                 hardware_error = str(e)
@@ -1038,9 +1038,9 @@ class WateringController:
         
         # METHOD 1: Use relay_controller - THIS WORKS
         try:
-            if self.relay_controller and hasattr(self.relay_controller, 'set_relay'):
+            if self.relay_controller and hasattr(self.relay_controller, 'set_relay_sync'):
                 logger.info(f"Forcing pump OFF with relay_controller (Method 1)")
-                result = self.relay_controller.set_relay(self.water_pump_relay_channel, False)
+                result = self.relay_controller.set_relay_sync(self.water_pump_relay_channel, False)
                 if result:
                     methods_success.append("relay_controller")
                     success = True
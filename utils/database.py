@@ -742,6 +742,43 @@ class Database:
         # Insert the event into the database
         self.insert_event(event_data)
         return True
+
+    def log_dosing_events_bulk(self, events):
+        """Log several nutrient dosing events in a single transaction
+        
+        Args:
+            events (list): (pump_id, amount_ml, timestamp, before) tuples, where before
+                is the {'before_ph', 'before_ec'} reading taken when that dose started,
+                or None
+        """
+        if not events:
+            return True
+        
+        try:
+            import json
+            rows = []
+            for pump_id, amount_ml, timestamp, before in events:
+                if timestamp is None:
+                    timestamp = time.time()
+                details = {'pump': pump_id, 'amount_ml': amount_ml}
+                if before:
+                    details.update(before)
+                event_data = {'type': 'nutrient_dose', 'timestamp': timestamp, 'details': details}
+                rows.append(('nutrient_dose', json.dumps(event_data), int(timestamp)))
+            
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:  # Commits once for the whole batch
+                    conn.executemany('''
+                    INSERT INTO events (type, data, timestamp)
+                    VALUES (?, ?, ?)
+                    ''', rows)
+            finally:
+                conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error logging {len(events)} dosing events: {e}")
+            return False
         
     def log_system_event(self, event_type, message, details=None):
         """Log system events
@@ -0,0 +1,46 @@
+"""
+JSON codec that prefers orjson and falls back to the standard library
+"""
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    JSONDecodeError = orjson.JSONDecodeError  # Subclass of json.JSONDecodeError
+except ImportError:
+    logger.warning("orjson not installed - using stdlib json (install with: pip install orjson)")
+    orjson = None
+    ORJSON_AVAILABLE = False
+    JSONDecodeError = json.JSONDecodeError
+
+
+if ORJSON_AVAILABLE:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj, **kwargs):
+        """Serialize obj to a compact JSON str.
+
+        Keyword arguments (e.g. separators passed by python-socketio) are only
+        honoured by the stdlib fallback, which is used for anything orjson
+        cannot encode.
+        """
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode()
+        except TypeError:
+            return json.dumps(obj, **kwargs)
+
+    def loads(data, **kwargs):
+        """Deserialize a JSON str/bytes document"""
+        return orjson.loads(data)
+else:
+    def dumps(obj, **kwargs):
+        """Serialize obj to a JSON str"""
+        kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs)
+
+    def loads(data, **kwargs):
+        """Deserialize a JSON str/bytes document"""
+        return json.loads(data, **kwargs)
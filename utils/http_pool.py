@@ -0,0 +1,98 @@
+"""
+Shared HTTP worker pool for Arduino / ESP32 traffic
+
+Requests are executed on a small pool of worker threads, each with its own
+keep-alive requests.Session, so that controllers can have several device
+requests in flight at once instead of serializing them on the caller's thread.
+Every call returns a concurrent.futures.Future; blocking callers use
+get_sync()/post_sync(), which bound the wait and run the request inline when
+they are already on a pool worker.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Extra seconds a blocking caller waits on top of the request's own timeout,
+# covering time spent queued behind other requests
+QUEUE_WAIT_SECONDS = 2.0
+
+
+class HttpPool:
+    """Thread pool that runs HTTP requests with per-thread pooled sessions"""
+
+    def __init__(self, max_workers=4, pool_maxsize=4):
+        self._local = threading.local()
+        self._pool_maxsize = pool_maxsize
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='http_pool',
+                                            initializer=self._init_worker)
+        logger.info(f"HTTP pool initialized with {max_workers} workers")
+
+    def _init_worker(self):
+        """Mark the new worker thread so _request_sync can tell it runs on the pool"""
+        self._local.is_worker = True
+
+    def _get_session(self):
+        """Return the calling worker thread's session, creating it on first use"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self._pool_maxsize, pool_maxsize=self._pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def _request(self, method, url, **kwargs):
+        return self._get_session().request(method, url, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run an arbitrary callable on the pool (for fire-and-forget device work)"""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def get(self, url, timeout=None, **kwargs):
+        """Schedule a GET request; returns a Future resolving to a requests.Response"""
+        return self._executor.submit(self._request, 'GET', url, timeout=timeout, **kwargs)
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        """Schedule a POST request; returns a Future resolving to a requests.Response"""
+        return self._executor.submit(self._request, 'POST', url, json=json, timeout=timeout, **kwargs)
+
+    def _request_sync(self, method, url, timeout=None, **kwargs):
+        """Run a request and block for its response
+        
+        On a pool worker the request runs inline with that worker's session:
+        submitting it back to the pool and waiting could deadlock once every
+        worker is doing the same. Elsewhere it runs on the pool and the wait is
+        bounded by the request timeout plus QUEUE_WAIT_SECONDS, raising
+        concurrent.futures.TimeoutError when the pool is too busy to serve it.
+        """
+        if getattr(self._local, 'is_worker', False):
+            return self._request(method, url, timeout=timeout, **kwargs)
+        future = self._executor.submit(self._request, method, url, timeout=timeout, **kwargs)
+        if timeout is None:
+            wait = None
+        else:
+            wait = (sum(timeout) if isinstance(timeout, tuple) else timeout) + QUEUE_WAIT_SECONDS
+        return future.result(wait)
+
+    def get_sync(self, url, timeout=None, **kwargs):
+        """GET and wait for the requests.Response (see _request_sync)"""
+        return self._request_sync('GET', url, timeout=timeout, **kwargs)
+
+    def post_sync(self, url, json=None, timeout=None, **kwargs):
+        """POST and wait for the requests.Response (see _request_sync)"""
+        return self._request_sync('POST', url, json=json, timeout=timeout, **kwargs)
+
+    def shutdown(self, wait=False):
+        """Stop accepting work and release worker threads"""
+        self._executor.shutdown(wait=wait)
+        logger.info("HTTP pool shut down")
+
+
+# Module-level pool shared by all controllers
+http_pool = HttpPool()